@@ -1,8 +1,10 @@
 import asyncio
+import time
 from datetime import datetime
 from typing import Dict
 from fastapi import WebSocket
 
+from .metrics import WEBSOCKET_SEND_LATENCY
 from .models import LogMessage
 
 
@@ -13,6 +15,8 @@ class ConnectionManager:
             {}
         )  # Store messages for connections not yet established
         self.connection_locks: Dict[str, asyncio.Lock] = {}
+        # When a message was last queued per task, so stale queues can be dropped
+        self.queued_at: Dict[str, float] = {}
 
     async def connect(self, websocket: WebSocket, task_id: str):
         await websocket.accept()
@@ -27,12 +31,14 @@ class ConnectionManager:
                     print(f"Error sending queued message: {e}")
             # Clear the queue after sending
             del self.message_queues[task_id]
+            self.queued_at.pop(task_id, None)
 
     def disconnect(self, task_id: str):
         if task_id in self.active_connections:
             del self.active_connections[task_id]
         if task_id in self.message_queues:
             del self.message_queues[task_id]
+        self.queued_at.pop(task_id, None)
         if task_id in self.connection_locks:
             del self.connection_locks[task_id]
 
@@ -57,7 +63,8 @@ class ConnectionManager:
         # If connection exists, send immediately
         if task_id in self.active_connections:
             try:
-                await self.active_connections[task_id].send_text(log_json)
+                with WEBSOCKET_SEND_LATENCY.time():
+                    await self.active_connections[task_id].send_text(log_json)
             except Exception as e:
                 print(f"Error sending WebSocket message: {e}")
                 self.disconnect(task_id)
@@ -66,6 +73,7 @@ class ConnectionManager:
             if task_id not in self.message_queues:
                 self.message_queues[task_id] = []
             self.message_queues[task_id].append(log_json)
+            self.queued_at[task_id] = time.monotonic()
 
             # Limit queue size to prevent memory issues
             if len(self.message_queues[task_id]) > 100:
@@ -74,5 +82,14 @@ class ConnectionManager:
     def get_connection_status(self, task_id: str) -> bool:
         return task_id in self.active_connections
 
+    def drop_stale_queues(self, max_age: float) -> int:
+        """Drop queued messages nobody connected for within max_age seconds"""
+        cutoff = time.monotonic() - max_age
+        stale = [task_id for task_id, at in self.queued_at.items() if at < cutoff]
+        for task_id in stale:
+            self.message_queues.pop(task_id, None)
+            del self.queued_at[task_id]
+        return len(stale)
+
     def get_queued_message_count(self, task_id: str) -> int:
         return len(self.message_queues.get(task_id, []))
@@ -1,39 +1,83 @@
 import asyncio
+import io
+import os
 import uuid
 from datetime import datetime
+from typing import Optional
 
 from fastapi import (
     FastAPI,
     File,
+    Query,
     UploadFile,
     WebSocket,
     WebSocketDisconnect,
     HTTPException,
+    Request,
 )
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-import numpy as np
+from fastapi.responses import Response, StreamingResponse
 import polars as pl
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import ValidationError
 
 from .models import (
+    BatchPredictionRequest,
     PredictionRequest,
     PredictionResponse,
+    TrainingJob,
     TrainModelRequest,
     TrainModelResponse,
 )
 
 from .connection_manager import ConnectionManager
+from .metrics import (
+    BYTES_INGESTED,
+    PROMETHEUS_MEDIA_TYPE,
+    MetricsMiddleware,
+    registry as metrics_registry,
+)
+from .responses import CompressionMiddleware, FastJSONResponse
 from .routes.ingestion_pipeline import CSVProcessor
 from .routes.profiler import DataProfiler
+from .routes.memory_governor import MemoryGovernor, estimate_parsed_size
 from .routes.ml_pipeline import MLProcessor
+from .routes.prediction_batcher import PredictionBatcher
+from .routes.query import parse_filter
+from .routes.rows import NDJSON_MEDIA_TYPE, ROW_FORMATS, RowBrowser
+from .routes.export import DataExporter
+from .routes.training_jobs import TrainingCapacityError, TrainingJobManager
+from .routes.charts import (
+    ARROW_STREAM_MEDIA_TYPE,
+    CHART_FORMATS,
+    ChartDataProcessor,
+    to_arrow_ipc,
+    to_columnar,
+)
+from .utils import frame_memory_usage
 from contextlib import asynccontextmanager
 
 
+# Trained models are persisted here and reloaded on demand
+MODEL_STORE_DIR = os.environ.get("MODEL_STORE_DIR", "model_store")
+MAX_RESIDENT_MODELS = 8
+# Most recently used models loaded at startup; 0 disables warm-up
+WARM_UP_MODELS = 2
+# Candidate targets pre-trained after an upload with speculative_training
+SPECULATIVE_TARGETS = 2
+# Memory held by task data and models; idle tasks are evicted after the TTL
+MEMORY_BUDGET_BYTES = int(os.environ.get("MEMORY_BUDGET_MB", "2048")) * 1024 * 1024
+TASK_TTL_SECONDS = float(os.environ.get("TASK_TTL_SECONDS", "7200"))
+MEMORY_CHECK_INTERVAL = 60
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Optional: startup logic here
+    warmed = await asyncio.to_thread(ml_processor.warm_up, WARM_UP_MODELS)
+    if warmed:
+        print(f"Warmed up {len(warmed)} model(s)")
+    governor_task = asyncio.create_task(memory_governor.run(MEMORY_CHECK_INTERVAL))
     yield
+    governor_task.cancel()
     # Shutdown logic
     active_tasks = csv_processor.get_active_tasks()
     for task_id in active_tasks:
@@ -42,10 +86,17 @@ async def lifespan(app: FastAPI):
     for task_id in list(connection_manager.active_connections.keys()):
         connection_manager.disconnect(task_id)
 
+    training_jobs.shutdown()
+    prediction_batcher.shutdown()
+
     print("Server shutdown complete")
 
 
-app = FastAPI(title="CSV Data Profiler API", lifespan=lifespan)
+app = FastAPI(
+    title="CSV Data Profiler API",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,11 +105,99 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+# Added last so it is outermost and times compression and CORS too
+app.add_middleware(MetricsMiddleware)
 
 # Initialize managers
 connection_manager = ConnectionManager()
 csv_processor = CSVProcessor(connection_manager)
-ml_processor = MLProcessor()
+ml_processor = MLProcessor(
+    model_dir=MODEL_STORE_DIR, max_resident_models=MAX_RESIDENT_MODELS
+)
+chart_processor = ChartDataProcessor()
+row_browser = RowBrowser()
+data_exporter = DataExporter()
+training_jobs = TrainingJobManager(ml_processor, connection_manager, max_concurrent=2)
+prediction_batcher = PredictionBatcher(ml_processor, window_ms=2.0, max_batch_size=32)
+memory_governor = MemoryGovernor(
+    csv_processor,
+    ml_processor,
+    training_jobs,
+    connection_manager,
+    caches=(chart_processor, row_browser),
+    budget_bytes=MEMORY_BUDGET_BYTES,
+    ttl_seconds=TASK_TTL_SECONDS,
+)
+
+
+def resident_memory_bytes():
+    """Resident set size of the server process, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return {}
+    return {(): pages * os.sysconf("SC_PAGE_SIZE")}
+
+
+def training_jobs_by_status():
+    counts = {}
+    for job in list(training_jobs.jobs.values()):
+        counts[(job.status,)] = counts.get((job.status,), 0) + 1
+    return counts
+
+
+# Gauges are read when /metrics is scraped, so serving paths pay nothing
+metrics_registry.gauge(
+    "prediction_queue_depth",
+    "Predictions waiting to be batched, per task",
+    ("task_id",),
+    lambda: {
+        (task_id,): depth
+        for task_id, depth in prediction_batcher.queue_depths().items()
+    },
+)
+metrics_registry.gauge(
+    "training_jobs", "Training jobs by status", ("status",), training_jobs_by_status
+)
+metrics_registry.gauge(
+    "speculative_training_queue_depth",
+    "Targets waiting to be trained speculatively",
+    (),
+    lambda: {(): len(training_jobs.speculation_queue)},
+)
+metrics_registry.gauge(
+    "websocket_queued_messages",
+    "Log messages queued for tasks without a WebSocket, per task",
+    ("task_id",),
+    lambda: {
+        (task_id,): len(messages)
+        for task_id, messages in list(connection_manager.message_queues.items())
+    },
+)
+metrics_registry.gauge(
+    "websocket_connections",
+    "Open WebSocket connections",
+    (),
+    lambda: {(): len(connection_manager.active_connections)},
+)
+metrics_registry.gauge(
+    "task_memory_bytes",
+    "Memory held per task, by processed data, models and caches",
+    ("task_id", "kind"),
+    lambda: {
+        (task_id, kind): usage[f"{kind}_bytes"]
+        for task_id, usage in memory_governor.task_usage().items()
+        for kind in ("data", "model", "cache")
+    },
+)
+metrics_registry.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of the server process",
+    (),
+    resident_memory_bytes,
+)
 
 
 @app.websocket("/ws/{task_id}")
@@ -87,7 +226,12 @@ async def websocket_endpoint(websocket: WebSocket, task_id: str):
 
 
 @app.post("/upload")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...),
+    speculative_training: bool = Query(
+        False, description="Pre-train the top candidate targets once processed"
+    ),
+):
     """Upload CSV file and start processing"""
 
     # Validate file
@@ -99,6 +243,7 @@ async def upload_csv(file: UploadFile = File(...)):
         content = await file.read()
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
+    BYTES_INGESTED.inc(len(content), "upload")
 
     # Check file size
     if len(content) > 50 * 1024 * 1024:  # 50MB
@@ -107,16 +252,26 @@ async def upload_csv(file: UploadFile = File(...)):
     if len(content) == 0:
         raise HTTPException(status_code=400, detail="File is empty")
 
+    # Evict idle tasks to make room, or refuse if the budget still won't fit it
+    if not memory_governor.admit(estimate_parsed_size(content)):
+        raise HTTPException(
+            status_code=503, detail="Server memory budget exhausted, try again later"
+        )
+
     # Generate task ID
     task_id = str(uuid.uuid4())
 
     # Start processing in background
     try:
-        await csv_processor.start_processing(content, task_id)
+        ingestion = await csv_processor.start_processing(content, task_id)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to start processing: {str(e)}"
         )
+    if speculative_training:
+        ingestion.add_done_callback(
+            lambda task: start_speculative_training(task_id, task)
+        )
 
     return {
         "task_id": task_id,
@@ -126,6 +281,18 @@ async def upload_csv(file: UploadFile = File(...)):
     }
 
 
+def start_speculative_training(task_id: str, ingestion: asyncio.Task):
+    """Queue background training of the detected targets once ingestion succeeds"""
+    if ingestion.cancelled() or ingestion.exception() is not None:
+        return
+    result = ingestion.result()
+    df = csv_processor.get_processed_data(task_id)
+    if result.success and df is not None:
+        training_jobs.speculate(
+            task_id, df, result.target_columns[:SPECULATIVE_TARGETS]
+        )
+
+
 @app.delete("/cancel/{task_id}")
 async def cancel_task(task_id: str):
     """Cancel a running task"""
@@ -140,7 +307,9 @@ async def cancel_task(task_id: str):
 
 
 @app.get("/profile/{task_id}")
-async def get_data_profile(task_id: str):
+async def get_data_profile(
+    task_id: str, parallel: bool = False, max_workers: Optional[int] = None
+):
     """Get comprehensive data profile"""
     df = csv_processor.get_processed_data(task_id)
     if df is None:
@@ -149,15 +318,22 @@ async def get_data_profile(task_id: str):
         )
 
     try:
-        profiler = DataProfiler(df)
+        if max_workers is not None and max_workers < 1:
+            raise HTTPException(status_code=400, detail="max_workers must be >= 1")
+
+        profiler = DataProfiler(df, parallel=parallel, max_workers=max_workers)
         profile = profiler.generate_profile()
 
-        return {
-            "task_id": task_id,
-            "profile": profile,
-            "success": True,
-            "message": "Profile generated successfully",
-        }
+        return FastJSONResponse(
+            content={
+                "task_id": task_id,
+                "profile": profile,
+                "success": True,
+                "message": "Profile generated successfully",
+            }
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error generating profile: {str(e)}"
@@ -171,6 +347,11 @@ async def get_chart_data(
     y_axis: str = None,
     chart_type: str = "scatter",
     limit: int = 200,
+    bins: Optional[int] = None,
+    agg: Optional[str] = None,
+    top_n: Optional[int] = None,
+    response_format: str = Query("records", alias="format"),
+    where: Optional[str] = None,
 ):
     """Get data for chart visualization"""
     df = csv_processor.get_processed_data(task_id)
@@ -191,40 +372,134 @@ async def get_chart_data(
         if y_axis and y_axis not in df.columns:
             raise HTTPException(status_code=400, detail=f"Column '{y_axis}' not found")
 
-        # Limit data for performance
-        df_limited = df.head(limit)
+        if limit < 1:
+            raise HTTPException(status_code=400, detail="limit must be >= 1")
+
+        if response_format not in CHART_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"format must be one of {CHART_FORMATS}",
+            )
+
+        if bins is not None and not 1 <= bins <= 1000:
+            raise HTTPException(
+                status_code=400, detail="bins must be between 1 and 1000"
+            )
+
+        extra = {}
+        points = None
+
+        # Filters and per-x aggregation of scatter/line charts run as a lazy
+        # query; the chart is then built on its result under its own cache scope
+        scope, view = task_id, df
+        point_agg = agg if chart_type in ["scatter", "line", "area"] else None
+        if where or point_agg:
+            try:
+                query = parse_filter(where) if where else None
+                scope, view = chart_processor.query_frame(
+                    task_id, df, x_axis, y_axis, query, point_agg
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            extra = {
+                "where": query.normalized if query else None,
+                "query_rows": len(view),
+            }
 
         if chart_type == "histogram" and not y_axis:
-            # For histogram, we just need x values
-            data = [
-                {"x": val} for val in df_limited[x_axis].to_list() if val is not None
-            ]
-
-        elif chart_type == "pie":
-            # For pie chart, group by x_axis and count
-            grouped = df_limited.group_by(x_axis).agg(pl.count().alias("count"))
-            data = [
-                {"name": str(row[x_axis]), "value": row["count"]}
-                for row in grouped.to_dicts()
-            ]
+            # Precomputed bins over the full column, one record per bin
+            try:
+                summary = chart_processor.histogram(scope, view, x_axis, bins)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            if "categories" in summary:
+                data = [
+                    {"x": category, "y": count}
+                    for category, count in zip(summary["categories"], summary["counts"])
+                ]
+            else:
+                edges = summary["edges"]
+                data = [
+                    {"x": (edges[i] + edges[i + 1]) / 2, "y": count}
+                    for i, count in enumerate(summary["counts"])
+                ]
+            extra["bins"] = summary
+
+        elif chart_type in ["pie", "bar"]:
+            # Category aggregation over the full column, top-N plus "Other"
+            if agg is None:
+                numeric_y = y_axis is not None and view[y_axis].dtype.is_numeric()
+                agg = "mean" if chart_type == "bar" and numeric_y else "count"
+            if top_n is None:
+                top_n = 10 if chart_type == "pie" else limit
+            if top_n < 1:
+                raise HTTPException(status_code=400, detail="top_n must be >= 1")
+
+            try:
+                groups = chart_processor.top_categories(
+                    scope, view, x_axis, y_axis, agg, top_n
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            if chart_type == "pie":
+                data = [{"name": str(g["x"]), "value": g["value"]} for g in groups]
+            else:
+                data = [
+                    {"x": g["x"], "y": g["value"], "count": g["count"]} for g in groups
+                ]
+            extra.update(
+                {
+                    "agg": agg,
+                    "top_n": top_n,
+                    "other_categories": (
+                        groups[-1].get("other_categories", 0) if groups else 0
+                    ),
+                }
+            )
 
         else:
-            # For scatter, line, bar charts
-            data = []
-            for row in df_limited.to_dicts():
-                x_val = row.get(x_axis)
-                y_val = row.get(y_axis)
-                if x_val is not None and y_val is not None:
-                    data.append({"x": x_val, "y": y_val})
-
-        return {
-            "data": data,
-            "x_axis": x_axis,
-            "y_axis": y_axis,
-            "chart_type": chart_type,
-            "total_rows": len(df),
-            "returned_rows": len(data),
-        }
+            # For scatter and line charts: downsample the full column
+            if chart_type in ["line", "area"]:
+                points = chart_processor.line_points(
+                    scope, view, x_axis, y_axis, limit
+                )
+            else:
+                points = chart_processor.scatter_points(
+                    scope, view, x_axis, y_axis, limit
+                )
+        # Small summaries are built as records; downsampled points stay as a frame
+        if response_format == "records":
+            if points is not None:
+                data = points.to_dicts()
+        else:
+            if points is None:
+                points = pl.DataFrame(data, strict=False)
+
+            if response_format == "arrow":
+                return Response(
+                    content=to_arrow_ipc(points),
+                    media_type=ARROW_STREAM_MEDIA_TYPE,
+                    headers={
+                        "X-Chart-Type": chart_type,
+                        "X-Total-Rows": str(len(df)),
+                        "X-Returned-Rows": str(len(points)),
+                    },
+                )
+            data = to_columnar(points)
+
+        return FastJSONResponse(
+            content={
+                "data": data,
+                "x_axis": x_axis,
+                "y_axis": y_axis,
+                "chart_type": chart_type,
+                "total_rows": len(df),
+                "returned_rows": len(points) if points is not None else len(data),
+                **extra,
+            }
+        )
 
     except HTTPException:
         raise  # Let FastAPI return the intended status code
@@ -234,6 +509,81 @@ async def get_chart_data(
         )
 
 
+@app.get("/rows/{task_id}")
+async def get_rows(
+    task_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 1000,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    response_format: str = Query("ndjson", alias="format"),
+):
+    """Stream a page of rows with cursor pagination"""
+    df = csv_processor.get_processed_data(task_id)
+    if df is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if not 1 <= limit <= 100_000:
+        raise HTTPException(
+            status_code=400, detail="limit must be between 1 and 100000"
+        )
+
+    if response_format not in ROW_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"format must be one of {ROW_FORMATS}"
+        )
+
+    selected = [col.strip() for col in columns.split(",")] if columns else None
+
+    try:
+        page, next_cursor = row_browser.page(
+            task_id, df, limit, cursor=cursor, columns=selected, sort=sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        row_browser.stream(page, response_format),
+        media_type=(
+            ARROW_STREAM_MEDIA_TYPE if response_format == "arrow" else NDJSON_MEDIA_TYPE
+        ),
+        headers={
+            "X-Next-Cursor": next_cursor or "",
+            "X-Total-Rows": str(len(df)),
+            "X-Returned-Rows": str(len(page)),
+        },
+    )
+
+
+@app.get("/export/{task_id}")
+async def export_data(
+    task_id: str,
+    export_format: str = Query("parquet", alias="format"),
+    compression: Optional[str] = None,
+):
+    """Stream the cleaned dataset as Parquet, CSV or Arrow"""
+    df = csv_processor.get_processed_data(task_id)
+    if df is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    try:
+        compression = data_exporter.resolve_compression(export_format, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, filename = data_exporter.describe(export_format, compression, task_id)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if compression != "uncompressed":
+        # Already compressed, keep the compression middleware from re-encoding it
+        headers["Content-Encoding"] = "identity"
+
+    return StreamingResponse(
+        data_exporter.stream(df, export_format, compression),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
 @app.post("/train", response_model=TrainModelResponse)
 async def train_model(request: TrainModelRequest):
     """Train a machine learning model"""
@@ -245,44 +595,200 @@ async def train_model(request: TrainModelRequest):
                 status_code=404, detail="Task not found or data not processed"
             )
 
-        # Train model
-        result = ml_processor.train_model(request.task_id, df, request.target_column)
+        # Train in a worker process so the event loop stays responsive
+        result = await training_jobs.train(
+            request.task_id,
+            df,
+            request.target_column,
+            engine=request.engine,
+            time_budget=request.time_budget,
+            tune=request.tune,
+        )
 
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
 
         return TrainModelResponse(**result)
 
+    except HTTPException:
+        raise
+    except TrainingCapacityError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
 
 
+@app.post("/train/jobs", response_model=TrainingJob)
+async def submit_training_job(request: TrainModelRequest):
+    """Start training in the background and return the job immediately"""
+    df = csv_processor.get_processed_data(request.task_id)
+    if df is None:
+        raise HTTPException(
+            status_code=404, detail="Task not found or data not processed"
+        )
+    if request.target_column not in df.columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Target column '{request.target_column}' not found in data",
+        )
+
+    try:
+        return await training_jobs.submit(
+            request.task_id,
+            df,
+            request.target_column,
+            engine=request.engine,
+            time_budget=request.time_budget,
+            tune=request.tune,
+        )
+    except TrainingCapacityError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@app.get("/train/jobs/{job_id}", response_model=TrainingJob)
+async def get_training_job(job_id: str):
+    """Get status, progress and result of a training job"""
+    job = training_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@app.delete("/train/jobs/{job_id}")
+async def cancel_training_job(job_id: str):
+    """Cancel a queued or running training job"""
+    if training_jobs.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    if not training_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Training job already finished")
+    return {"message": f"Training job {job_id} cancelled"}
+
+
+@app.post("/append/{task_id}")
+async def append_data(
+    task_id: str,
+    file: UploadFile = File(...),
+    update_model: bool = Query(
+        True, description="Refresh the task's model with the appended rows"
+    ),
+):
+    """
+    Append CSV rows to a processed task. If the task has a model, it is
+    updated incrementally from the new rows instead of retrained.
+    """
+    if csv_processor.get_processed_data(task_id) is None:
+        raise HTTPException(
+            status_code=404, detail="Task not found or data not processed"
+        )
+    # A running job would register its model over the update when it finishes
+    if update_model and any(
+        training_jobs.jobs[job_id].task_id == task_id
+        for job_id in training_jobs.get_requested_jobs()
+    ):
+        raise HTTPException(
+            status_code=409,
+            detail="A training job is running for this task, append once it finishes",
+        )
+    content = await file.read()
+    BYTES_INGESTED.inc(len(content), "append")
+    if not memory_governor.admit(estimate_parsed_size(content), keep=(task_id,)):
+        raise HTTPException(
+            status_code=503, detail="Server memory budget exhausted, try again later"
+        )
+    try:
+        new_rows = pl.read_csv(io.BytesIO(content))
+        new_rows = csv_processor.append_rows(task_id, new_rows)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rows: {str(e)}")
+
+    response = {
+        "task_id": task_id,
+        "appended_rows": new_rows.height,
+        "total_rows": csv_processor.get_processed_data(task_id).height,
+        "model_update": None,
+    }
+    if update_model and await asyncio.to_thread(ml_processor.get_model_info, task_id):
+        try:
+            result = await asyncio.to_thread(
+                ml_processor.update_model, task_id, new_rows
+            )
+            response["model_update"] = TrainModelResponse(**result).model_dump()
+        except ValueError as e:
+            response["model_update"] = {"success": False, "error": str(e)}
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Model update failed: {str(e)}"
+            )
+    return response
+
+
 @app.post("/predict", response_model=PredictionResponse)
 async def predict(request: PredictionRequest):
     """Make predictions using trained model"""
     try:
-        result = ml_processor.predict(request.task_id, request.input_data)
+        # Concurrent requests for the same model are scored together
+        result = await prediction_batcher.predict(request.task_id, request.input_data)
 
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
 
-        return JSONResponse(
-            content=jsonable_encoder(
-                result,
-                custom_encoder={
-                    np.integer: lambda x: int(x),
-                    np.floating: lambda x: float(x),
-                    np.ndarray: lambda x: x.tolist(),
-                    np.str_: lambda x: str(x),
-                    np.str_: lambda x: str(x),
-                },
-            )
-        )
+        return FastJSONResponse(content=result)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Score many rows at once. Accepts a JSON body with `task_id` and `rows`, or a
+    multipart upload with a `task_id` field and a CSV `file`. Results are
+    streamed back as NDJSON, one line per input row in order.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            task_id = form.get("task_id")
+            upload = form.get("file")
+            if not task_id or upload is None or isinstance(upload, str):
+                raise HTTPException(
+                    status_code=400, detail="task_id and a CSV file are required"
+                )
+            input_df = pl.read_csv(io.BytesIO(await upload.read()))
+        else:
+            body = BatchPredictionRequest(**await request.json())
+            task_id = body.task_id
+            input_df = pl.DataFrame(body.rows, infer_schema_length=None)
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch input: {str(e)}")
+
+    try:
+        # Encodes every row up front, so bad values fail before streaming
+        batches = await asyncio.to_thread(
+            ml_processor.predict_batches, task_id, input_df
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        batches,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"X-Total-Rows": str(input_df.height)},
+    )
+
+
+@app.get("/predict/cache")
+async def get_prediction_cache_stats():
+    """Hit rate and size of the prediction result cache"""
+    return FastJSONResponse(content=ml_processor.prediction_cache.stats())
+
+
 @app.get("/model-info/{task_id}")
 async def get_model_info(task_id: str):
     """Get model information"""
@@ -322,6 +828,7 @@ async def get_processed_data_info(task_id: str):
             "column_types": {col: str(df[col].dtype) for col in df.columns},
             "sample_values": {col: df[col].head(3).to_list() for col in df.columns},
             "shape": df.shape,
+            "memory_usage": frame_memory_usage(df),
             "processing_result": {
                 "success": result.success,
                 "summary": result.summary,
@@ -352,6 +859,12 @@ async def debug_task(task_id: str):
     }
 
 
+@app.get("/memory")
+async def memory_report():
+    """Memory used by processed data across all tasks"""
+    return csv_processor.get_memory_report()
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint"""
@@ -361,9 +874,17 @@ async def health():
         "timestamp": datetime.now().isoformat(),
         "active_tasks": len(active_tasks),
         "active_connections": len(connection_manager.active_connections),
+        "memory": memory_governor.report(),
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Latency histograms, counters and gauges in the Prometheus text format"""
+    body = await asyncio.to_thread(metrics_registry.render)
+    return Response(content=body, media_type=PROMETHEUS_MEDIA_TYPE)
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,5 +1,5 @@
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
 
 
 # connection manager
@@ -26,6 +26,16 @@ class ProcessingResult(BaseModel):
 class TrainModelRequest(BaseModel):
     task_id: str
     target_column: str
+    engine: Literal["random_forest", "hist_gradient_boosting"] = "random_forest"
+    time_budget: Optional[float] = Field(default=None, gt=0, le=3600)  # seconds
+    tune: bool = False  # Successive-halving hyperparameter search first
+
+    @model_validator(mode="after")
+    def check_tune_budget(self):
+        # The search has no wall-clock limit, so a budget could not be honoured
+        if self.tune and self.time_budget is not None:
+            raise ValueError("time_budget cannot be combined with tune")
+        return self
 
 
 class PredictionRequest(BaseModel):
@@ -33,6 +43,11 @@ class PredictionRequest(BaseModel):
     input_data: Dict[str, Any]
 
 
+class BatchPredictionRequest(BaseModel):
+    task_id: str
+    rows: List[Dict[str, Any]]
+
+
 class TrainModelResponse(BaseModel):
     success: bool
     model_type: Optional[str] = None
@@ -42,6 +57,17 @@ class TrainModelResponse(BaseModel):
     feature_types: Optional[Dict[str, str]] = None
     n_samples: Optional[int] = None
     n_features: Optional[int] = None
+    engine: Optional[str] = None
+    training_samples: Optional[int] = None
+    n_estimators: Optional[int] = None
+    training_seconds: Optional[float] = None
+    params: Optional[Dict[str, Any]] = None
+    cv_score: Optional[float] = None
+    # Incremental updates: count, score before and after, and the drift
+    updates: int = 0
+    previous_score: Optional[float] = None
+    pre_update_score: Optional[float] = None
+    score_drift: Optional[float] = None
     error: Optional[str] = None
 
 
@@ -51,4 +77,22 @@ class PredictionResponse(BaseModel):
     prediction_proba: Optional[Dict[str, float]] = None
     input_data: Optional[Dict[str, Any]] = None
     model_type: Optional[str] = None
+    unseen_categories: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
+class TrainingJob(BaseModel):
+    job_id: str
+    task_id: str
+    target_column: str
+    engine: str = "random_forest"
+    time_budget: Optional[float] = None
+    tune: bool = False
+    speculative: bool = False  # Started by the server, not by a request
+    status: str  # "queued", "running", "completed", "failed", "cancelled"
+    progress: int = 0
+    message: Optional[str] = None
+    result: Optional[TrainModelResponse] = None
     error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
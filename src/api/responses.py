@@ -0,0 +1,114 @@
+import datetime
+import decimal
+from typing import Any, List
+
+import numpy as np
+import orjson
+import polars as pl
+import zstandard
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+def _default(value: Any) -> Any:
+    """Fallback for types orjson does not serialize natively"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pl.Series):
+        return value.to_list()
+    if isinstance(value, pl.DataFrame):
+        return value.to_dict(as_series=False)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Numpy arrays and scalars, datetimes and
+    Polars values are serialized natively, and NaN/inf become null. Returning
+    it directly from a route also skips FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int = 3) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.compress(body)
+        if more_body:
+            # Emit a complete block so streamed chunks reach the client promptly
+            return compressed + self.compressor.flush(
+                zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+        return compressed + self.compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses above a size threshold with the best encoding the
+    client accepts, zstd before gzip.
+    Responses that already set Content-Encoding are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = self._accepted_encodings(
+            Headers(scope=scope).get("Accept-Encoding", "")
+        )
+        responder: ASGIApp
+        if "zstd" in encodings:
+            responder = ZstdResponder(self.app, self.minimum_size, self.zstd_level)
+        elif "gzip" in encodings:
+            responder = GZipResponder(
+                self.app, self.minimum_size, compresslevel=self.gzip_level
+            )
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
+
+    @staticmethod
+    def _accepted_encodings(header: str) -> List[str]:
+        """Encodings from an Accept-Encoding header, skipping those with q=0"""
+        encodings = []
+        for part in header.split(","):
+            name, _, params = part.strip().partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q=") and params[2:].strip("0.") == "":
+                continue
+            if name:
+                encodings.append(name.strip().lower())
+        return encodings
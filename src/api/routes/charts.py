@@ -0,0 +1,483 @@
+import io
+import math
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from .query import FilterQuery
+from ..utils import setup_logger
+
+QUANTILES = [0.0, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 1.0]
+MAX_AUTO_BINS = 100
+SAMPLE_SEED = 42
+CATEGORY_AGGREGATIONS = ["count", "sum", "mean"]
+OTHER_LABEL = "Other"
+CHART_FORMATS = ["records", "columnar", "arrow"]
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# Results kept per task, query frames included; least recently used go first
+MAX_CACHED_RESULTS = 64
+
+
+def to_columnar(df: pl.DataFrame) -> Dict[str, List[Any]]:
+    """One list per column, converted straight from the Series buffers"""
+    return {col: df[col].to_list() for col in df.columns}
+
+
+def to_arrow_ipc(df: pl.DataFrame) -> bytes:
+    """Serialize a frame as an Arrow IPC stream"""
+    buffer = io.BytesIO()
+    df.write_ipc_stream(buffer)
+    return buffer.getvalue()
+
+
+def result_nbytes(value: Any) -> int:
+    """Approximate size of a cached result: frames by their buffers, the rest by object"""
+    if isinstance(value, (pl.DataFrame, pl.Series)):
+        return int(value.estimated_size())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            result_nbytes(key) + result_nbytes(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ChartDataProcessor:
+    """
+    Computes chart-ready summaries over full columns and caches them per task.
+    Each task keeps at most MAX_CACHED_RESULTS results in LRU order, shared
+    between charts of the full frame and of its query results, so distinct
+    filter strings cannot grow the cache without bound.
+    """
+
+    def __init__(self):
+        # Per task: (scope, key) -> result, least recently used first
+        self.cache: Dict[str, "OrderedDict[Tuple[str, Hashable], Any]"] = {}
+        # Frame each task's cache was computed from, so replaced data invalidates it
+        self.cached_frames: Dict[str, pl.DataFrame] = {}
+        self.logger = setup_logger(__name__)
+
+    def _cached(
+        self,
+        scope: str,
+        df: pl.DataFrame,
+        key: Hashable,
+        compute: Callable[[], Any],
+    ) -> Any:
+        """
+        Return a cached result for a task's frame, or for a query scope from
+        query_frame, computing it on a miss. A query scope's frame is derived
+        from the task's frame, so only the task's frame is checked.
+        """
+        task_id = scope.split("|", 1)[0]
+        if scope == task_id and self.cached_frames.get(task_id) is not df:
+            self.cache[task_id] = OrderedDict()
+            self.cached_frames[task_id] = df
+
+        task_cache = self.cache.setdefault(task_id, OrderedDict())
+        entry = (scope, key)
+        if entry in task_cache:
+            task_cache.move_to_end(entry)
+            return task_cache[entry]
+
+        value = task_cache[entry] = compute()
+        while len(task_cache) > MAX_CACHED_RESULTS:
+            task_cache.popitem(last=False)
+        return value
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by each task's cached results, query frames included"""
+        return {
+            task_id: sum(result_nbytes(value) for value in list(task_cache.values()))
+            for task_id, task_cache in list(self.cache.items())
+        }
+
+    def invalidate(self, task_id: str):
+        """Drop every cached result for a task, including its query scopes"""
+        self.cache.pop(task_id, None)
+        self.cached_frames.pop(task_id, None)
+
+    def query_frame(
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        x_axis: str,
+        y_axis: Optional[str],
+        where: Optional[FilterQuery] = None,
+        agg: Optional[str] = None,
+    ) -> Tuple[str, pl.DataFrame]:
+        """
+        Filter and optionally aggregate y per x with a lazy plan that only reads
+        the columns involved. Returns the cache scope for charts built on the
+        result, along with the result itself.
+        """
+        axes = list(dict.fromkeys([x_axis] + ([y_axis] if y_axis else [])))
+        filter_columns = list(where.columns) if where else []
+
+        missing = [col for col in filter_columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Filter column(s) not found: {missing}")
+        if agg is not None:
+            if agg not in CATEGORY_AGGREGATIONS:
+                raise ValueError(
+                    f"Unsupported aggregation '{agg}', expected one of {CATEGORY_AGGREGATIONS}"
+                )
+            if not y_axis:
+                raise ValueError("y_axis required for aggregation")
+            if agg != "count" and not df[y_axis].dtype.is_numeric():
+                raise ValueError(f"'{agg}' aggregation requires a numeric y_axis")
+
+        key = ("query", where.normalized if where else None, x_axis, y_axis, agg)
+
+        def compute() -> pl.DataFrame:
+            plan = df.lazy().select(list(dict.fromkeys(axes + filter_columns)))
+            if where:
+                plan = plan.filter(where.expr)
+            plan = plan.select(axes)
+            if agg is not None:
+                y_value = {
+                    "count": pl.col(y_axis).count(),
+                    "sum": pl.col(y_axis).sum(),
+                    "mean": pl.col(y_axis).mean(),
+                }[agg]
+                plan = plan.group_by(x_axis).agg(y_value).sort(x_axis)
+            try:
+                return plan.collect()
+            except pl.exceptions.PolarsError as e:
+                raise ValueError(f"Invalid query: {e}")
+
+        frame = self._cached(task_id, df, key, compute)
+        return f"{task_id}|{key!r}", frame
+
+    def histogram(
+        self, task_id: str, df: pl.DataFrame, column: str, bins: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Get histogram bins and quantiles for a numeric column, or counts per
+        category for any other column
+        """
+        if not df[column].dtype.is_numeric():
+            return self._cached(
+                task_id,
+                df,
+                ("histogram", column, None),
+                lambda: self._categorical_histogram(task_id, df, column),
+            )
+
+        return self._cached(
+            task_id,
+            df,
+            ("histogram", column, bins),
+            lambda: self._compute_histogram(df[column], bins),
+        )
+
+    def _categorical_histogram(
+        self, task_id: str, df: pl.DataFrame, column: str
+    ) -> Dict[str, Any]:
+        """
+        Non-null row counts of the MAX_AUTO_BINS most frequent categories, with
+        the remaining categories folded into a single "Other" bucket
+        """
+        groups = (
+            self.category_groups(task_id, df, column)
+            .filter(pl.col("x").is_not_null())
+            .sort(["count", "x"], descending=[True, False])
+        )
+        top, rest = groups.head(MAX_AUTO_BINS), groups.slice(MAX_AUTO_BINS)
+        categories, counts = top["x"].to_list(), top["count"].to_list()
+        if len(rest) > 0:
+            categories.append(OTHER_LABEL)
+            counts.append(int(rest["count"].sum()))
+
+        return {
+            "categories": categories,
+            "counts": counts,
+            "count": int(groups["count"].sum()),
+            "other_categories": len(rest),
+            "bin_method": "categorical",
+        }
+
+    def _compute_histogram(
+        self, series: pl.Series, bins: Optional[int]
+    ) -> Dict[str, Any]:
+        """Bin the full column using a fixed bin count or the Freedman-Diaconis rule"""
+        values = series.drop_nulls().cast(pl.Float64)
+        values = values.filter(values.is_finite())
+        n = len(values)
+
+        if n == 0:
+            return {
+                "edges": [],
+                "counts": [],
+                "quantiles": {},
+                "count": 0,
+                "bin_method": "empty",
+            }
+
+        quantile_values = {
+            str(q): float(values.quantile(q, interpolation="linear")) for q in QUANTILES
+        }
+        low, high = quantile_values["0.0"], quantile_values["1.0"]
+
+        if bins is not None:
+            bin_count, method = bins, "fixed"
+        else:
+            bin_count, method = self._freedman_diaconis_bins(
+                n, low, high, quantile_values["0.75"] - quantile_values["0.25"]
+            )
+
+        if low == high:
+            # Single distinct value: one bin centered on it
+            low, high, bin_count = low - 0.5, high + 0.5, 1
+
+        counts, edges = np.histogram(
+            values.to_numpy(), bins=bin_count, range=(low, high)
+        )
+
+        return {
+            "edges": edges.tolist(),
+            "counts": counts.tolist(),
+            "quantiles": quantile_values,
+            "count": n,
+            "bin_method": method,
+        }
+
+    @staticmethod
+    def _freedman_diaconis_bins(n: int, low: float, high: float, iqr: float):
+        """Bin count from the Freedman-Diaconis rule, falling back to Sturges"""
+        if iqr > 0 and high > low:
+            width = 2 * iqr / (n ** (1 / 3))
+            bin_count = math.ceil((high - low) / width)
+            return max(1, min(bin_count, MAX_AUTO_BINS)), "freedman-diaconis"
+
+        return max(1, min(math.ceil(math.log2(n)) + 1, MAX_AUTO_BINS)), "sturges"
+
+    def line_points(
+        self, task_id: str, df: pl.DataFrame, x_axis: str, y_axis: str, limit: int
+    ) -> pl.DataFrame:
+        """Downsample a line over the full column with Largest-Triangle-Three-Buckets"""
+        return self._cached(
+            task_id,
+            df,
+            ("line", x_axis, y_axis, limit),
+            lambda: self._lttb(self._xy_points(df, x_axis, y_axis), limit),
+        )
+
+    def scatter_points(
+        self, task_id: str, df: pl.DataFrame, x_axis: str, y_axis: str, limit: int
+    ) -> pl.DataFrame:
+        """Downsample a scatter over the full column with 2D binning"""
+        return self._cached(
+            task_id,
+            df,
+            ("scatter", x_axis, y_axis, limit),
+            lambda: self._binned_sample(self._xy_points(df, x_axis, y_axis), limit),
+        )
+
+    def category_groups(
+        self, task_id: str, df: pl.DataFrame, x_axis: str, y_axis: Optional[str] = None
+    ) -> pl.DataFrame:
+        """Full-column group-by of x with row counts and, if given, y sums"""
+
+        def compute() -> pl.DataFrame:
+            aggregations = [pl.len().alias("count")]
+            if y_axis:
+                aggregations += [
+                    pl.col("y").sum().alias("y_sum"),
+                    pl.col("y").count().alias("y_count"),
+                ]
+                selection = df.select(
+                    pl.col(x_axis).alias("x"), pl.col(y_axis).alias("y")
+                )
+            else:
+                selection = df.select(pl.col(x_axis).alias("x"))
+            return selection.group_by("x").agg(aggregations)
+
+        return self._cached(task_id, df, ("groups", x_axis, y_axis), compute)
+
+    def top_categories(
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        x_axis: str,
+        y_axis: Optional[str],
+        agg: str,
+        top_n: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-N categories of x by the aggregated value, with the remaining
+        categories folded into a single "Other" bucket. Built on the cached
+        group-by, so switching between pie and bar does not rescan the column.
+        """
+        if agg not in CATEGORY_AGGREGATIONS:
+            raise ValueError(
+                f"Unsupported aggregation '{agg}', expected one of {CATEGORY_AGGREGATIONS}"
+            )
+        if agg != "count":
+            if not y_axis:
+                raise ValueError(f"y_axis required for '{agg}' aggregation")
+            if not df[y_axis].dtype.is_numeric():
+                raise ValueError(f"'{agg}' aggregation requires a numeric y_axis")
+
+        groups = self.category_groups(
+            task_id, df, x_axis, y_axis if agg != "count" else None
+        )
+
+        if agg == "count":
+            value = pl.col("count")
+        elif agg == "sum":
+            value = pl.col("y_sum")
+        else:
+            value = pl.col("y_sum") / pl.col("y_count")
+
+        # Rank means by group size so tiny groups with extreme means don't win
+        rank = pl.col("count") if agg == "mean" else pl.col("value")
+        ranked = groups.with_columns(value.alias("value")).sort(
+            [rank, pl.col("x")], descending=[True, False], nulls_last=True
+        )
+
+        top = ranked.head(top_n)
+        records = [
+            {"x": row["x"], "value": row["value"], "count": row["count"]}
+            for row in top.select("x", "value", "count").to_dicts()
+        ]
+
+        rest = ranked.slice(top_n)
+        if len(rest) > 0:
+            if agg == "count":
+                other_value = rest["count"].sum()
+            elif agg == "sum":
+                other_value = rest["y_sum"].sum()
+            else:
+                y_count = rest["y_count"].sum()
+                other_value = float(rest["y_sum"].sum() / y_count) if y_count else None
+            records.append(
+                {
+                    "x": OTHER_LABEL,
+                    "value": other_value,
+                    "count": int(rest["count"].sum()),
+                    "other_categories": len(rest),
+                }
+            )
+
+        return records
+
+    @staticmethod
+    def _xy_points(df: pl.DataFrame, x_axis: str, y_axis: str) -> pl.DataFrame:
+        """Non-null (x, y) pairs of the full frame, in row order"""
+        return df.select(
+            pl.col(x_axis).alias("x"), pl.col(y_axis).alias("y")
+        ).drop_nulls()
+
+    @staticmethod
+    def _as_float(points: pl.DataFrame, column: str) -> pl.Expr:
+        """Numeric view of a column for geometry, using row position for text"""
+        dtype = points[column].dtype
+        if dtype.is_numeric():
+            return pl.col(column).cast(pl.Float64)
+        if dtype.is_temporal():
+            return pl.col(column).to_physical().cast(pl.Float64)
+        return pl.int_range(pl.len()).cast(pl.Float64)
+
+    def _lttb(self, points: pl.DataFrame, limit: int) -> pl.DataFrame:
+        """
+        Vectorized LTTB: the first and last points are kept and the rest are split
+        into limit - 2 buckets, keeping the point of each bucket that forms the
+        largest triangle with the neighbouring buckets. The anchor on the left is
+        the previous bucket's average rather than its selected point, which lets
+        every bucket be solved at once.
+        """
+        if points["x"].dtype.is_numeric() or points["x"].dtype.is_temporal():
+            points = points.sort("x")
+
+        n = len(points)
+        if n <= limit:
+            return points
+        if limit < 3:
+            return pl.concat([points.head(1), points.tail(1)]).head(limit)
+
+        points = points.with_columns(
+            self._as_float(points, "x").alias("_xf"),
+            self._as_float(points, "y").alias("_yf"),
+        ).with_columns(
+            pl.when(pl.int_range(pl.len()) == 0)
+            .then(0)
+            .when(pl.int_range(pl.len()) == n - 1)
+            .then(limit - 1)
+            .otherwise((pl.int_range(pl.len()) - 1) * (limit - 2) // (n - 2) + 1)
+            .alias("_bucket")
+        )
+
+        means = (
+            points.group_by("_bucket")
+            .agg(pl.col("_xf").mean().alias("_mx"), pl.col("_yf").mean().alias("_my"))
+            .sort("_bucket")
+            .select(
+                "_bucket",
+                pl.col("_mx").shift(1).alias("_ax"),
+                pl.col("_my").shift(1).alias("_ay"),
+                pl.col("_mx").shift(-1).alias("_cx"),
+                pl.col("_my").shift(-1).alias("_cy"),
+            )
+        )
+
+        area = (
+            (pl.col("_ax") - pl.col("_cx")) * (pl.col("_yf") - pl.col("_ay"))
+            - (pl.col("_ax") - pl.col("_xf")) * (pl.col("_cy") - pl.col("_ay"))
+        ).abs()
+
+        return (
+            points.join(means, on="_bucket", how="left")
+            .with_columns(area.fill_null(0.0).alias("_area"))
+            .filter(pl.col("_area") == pl.col("_area").max().over("_bucket"))
+            .unique("_bucket", keep="first", maintain_order=True)
+            .select("x", "y")
+        )
+
+    def _binned_sample(self, points: pl.DataFrame, limit: int) -> pl.DataFrame:
+        """
+        Keep one point per occupied cell of a sqrt(limit) x sqrt(limit) grid, so
+        sparse regions and outliers survive while dense clusters are thinned.
+        """
+        n = len(points)
+        if n <= limit:
+            return points
+
+        plottable = points["x"].dtype.is_numeric() or points["x"].dtype.is_temporal()
+        plottable &= points["y"].dtype.is_numeric() or points["y"].dtype.is_temporal()
+        if not plottable:
+            # No geometry to bin on: fall back to a uniform sample
+            return points.sample(n=limit, seed=SAMPLE_SEED)
+
+        grid = max(1, math.isqrt(limit))
+
+        def cell(column: str) -> pl.Expr:
+            value = self._as_float(points, column)
+            low, high = value.min(), value.max()
+            scaled = (value - low) / (high - low) * grid
+            return (
+                pl.when(high > low)
+                .then(scaled.floor().clip(0, grid - 1))
+                .otherwise(0)
+                .cast(pl.Int64)
+            )
+
+        # Shuffle first so each cell's representative is a random member
+        return (
+            points.with_columns((cell("x") * grid + cell("y")).alias("_cell"))
+            .sample(fraction=1.0, shuffle=True, seed=SAMPLE_SEED)
+            .group_by("_cell")
+            .agg(
+                pl.col("x").first(),
+                pl.col("y").first(),
+                pl.len().alias("count"),
+            )
+            .sort("_cell")
+            .drop("_cell")
+        )
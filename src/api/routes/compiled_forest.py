@@ -0,0 +1,110 @@
+from typing import List
+
+import numpy as np
+
+# Batches up to this size use the compiled forest; larger ones go to sklearn,
+# whose per-tree Cython loops win once the call overhead is amortized
+COMPILED_MAX_ROWS = 32
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier/Regressor flattened into flat node arrays
+    for all trees, traversed level by level with numpy for every (row, tree)
+    pair at once. Skips sklearn's per-call validation and thread dispatch, and
+    keeps only what prediction needs from each node.
+
+    Outputs are identical to the sklearn model's predict_proba/predict: the
+    same float64 threshold comparisons and missing-value routing, and tree
+    outputs summed in order before dividing by the number of trees.
+    """
+
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        self.is_classifier = hasattr(model, "predict_proba")
+        self.classes_ = getattr(model, "classes_", None)
+        self.n_trees = len(trees)
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+        features: List[np.ndarray] = []
+        thresholds: List[np.ndarray] = []
+        lefts: List[np.ndarray] = []
+        rights: List[np.ndarray] = []
+        missing_left: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        roots = []
+
+        offset = 0
+        for tree in trees:
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so every row can take max_depth steps
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            missing_left.append(tree.missing_go_to_left.astype(bool))
+
+            # Classifier trees already store class fractions per node
+            values.append(
+                tree.value[:, 0, :] if self.is_classifier else tree.value[:, 0, 0]
+            )
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        self.feature = np.concatenate(features).astype(np.int32)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.missing_left = np.concatenate(missing_left)
+        self.value = np.concatenate(values)
+        self.roots = np.array(roots, dtype=np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the node arrays"""
+        return sum(
+            array.nbytes
+            for array in (
+                self.feature,
+                self.threshold,
+                self.left,
+                self.right,
+                self.missing_left,
+                self.value,
+                self.roots,
+            )
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index of every row in every tree, shape (n_rows, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (
+                np.isnan(x) & self.missing_left[nodes]
+            )
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _mean_over_trees(self, X: np.ndarray) -> np.ndarray:
+        # Accumulate tree by tree like sklearn; numpy's sum may reorder the
+        # additions and differ in the last bit
+        leaves = self.value[self.apply(X).T]
+        total = np.zeros(leaves.shape[1:])
+        for tree_values in leaves:
+            total += tree_values
+        return total / self.n_trees
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self._mean_over_trees(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+        return self._mean_over_trees(X)
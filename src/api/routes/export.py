@@ -0,0 +1,111 @@
+import os
+import tempfile
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+import polars as pl
+
+from ..utils import setup_logger
+
+EXPORT_CHUNK_BYTES = 1024 * 1024
+CSV_BATCH_ROWS = 50_000
+
+# format -> (allowed compressions, default compression)
+EXPORT_COMPRESSIONS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "parquet": (("zstd", "snappy", "gzip", "lz4", "uncompressed"), "zstd"),
+    "arrow": (("zstd", "lz4", "uncompressed"), "uncompressed"),
+    "csv": (("gzip", "uncompressed"), "uncompressed"),
+}
+
+
+class DataExporter:
+    """Streams cleaned frames out as Parquet, CSV or Arrow with bounded memory"""
+
+    def __init__(self):
+        self.logger = setup_logger(__name__)
+
+    @staticmethod
+    def resolve_compression(export_format: str, compression: Optional[str]) -> str:
+        """Validate a format/compression pair, filling in the format's default"""
+        if export_format not in EXPORT_COMPRESSIONS:
+            raise ValueError(
+                f"format must be one of {list(EXPORT_COMPRESSIONS.keys())}"
+            )
+        allowed, default = EXPORT_COMPRESSIONS[export_format]
+        compression = compression or default
+        if compression not in allowed:
+            raise ValueError(
+                f"compression for {export_format} must be one of {list(allowed)}"
+            )
+        return compression
+
+    @staticmethod
+    def describe(export_format: str, compression: str, name: str) -> Tuple[str, str]:
+        """Media type and download filename for an export"""
+        if export_format == "parquet":
+            return "application/vnd.apache.parquet", f"{name}.parquet"
+        if export_format == "arrow":
+            return "application/vnd.apache.arrow.file", f"{name}.arrow"
+        if compression == "gzip":
+            return "application/gzip", f"{name}.csv.gz"
+        return "text/csv", f"{name}.csv"
+
+    def stream(
+        self, df: pl.DataFrame, export_format: str, compression: str
+    ) -> Iterator[bytes]:
+        """Yield the encoded frame chunk by chunk"""
+        if export_format == "csv":
+            yield from self._stream_csv(df, compression)
+        else:
+            yield from self._stream_sink(df, export_format, compression)
+
+    @staticmethod
+    def _stream_csv(df: pl.DataFrame, compression: str) -> Iterator[bytes]:
+        """Encode CSV one row batch at a time, gzip-compressing incrementally"""
+        compressor = (
+            zlib.compressobj(wbits=31) if compression == "gzip" else None
+        )  # wbits=31 writes a gzip container
+
+        for start in range(0, max(df.height, 1), CSV_BATCH_ROWS):
+            chunk = (
+                df.slice(start, CSV_BATCH_ROWS)
+                .write_csv(include_header=start == 0)
+                .encode()
+            )
+            if compressor is None:
+                yield chunk
+            else:
+                compressed = compressor.compress(chunk)
+                if compressed:
+                    yield compressed
+
+        if compressor is not None:
+            yield compressor.flush()
+
+    def _stream_sink(
+        self, df: pl.DataFrame, export_format: str, compression: str
+    ) -> Iterator[bytes]:
+        """
+        Parquet and Arrow files need a footer written after all data, so the
+        frame is sunk to a temporary file by Polars' streaming writer and then
+        read back in fixed-size chunks. The file is removed once streamed.
+        """
+        handle, path = tempfile.mkstemp(suffix=f".{export_format}")
+        os.close(handle)
+        try:
+            if export_format == "parquet":
+                df.lazy().sink_parquet(path, compression=compression)
+            else:
+                df.lazy().sink_ipc(
+                    path,
+                    compression=None if compression == "uncompressed" else compression,
+                )
+
+            with open(path, "rb") as file:
+                while chunk := file.read(EXPORT_CHUNK_BYTES):
+                    yield chunk
+        finally:
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"Could not remove export file {path}: {e}")
@@ -1,10 +1,13 @@
 import io
 import asyncio
 import json
-from typing import Dict, List
+import time
+from typing import Any, Dict, List
 import polars as pl
 
+from ..metrics import STAGE_LATENCY
 from ..models import ProcessingResult
+from ..utils import frame_memory_usage
 
 from ..connection_manager import ConnectionManager
 
@@ -15,6 +18,11 @@ class CSVProcessor:
         self.processed_data: Dict[str, pl.DataFrame] = {}
         self.processing_results: Dict[str, ProcessingResult] = {}
         self.active_tasks: Dict[str, asyncio.Task] = {}
+        # When each task's data was last stored or read, for eviction
+        self.last_used: Dict[str, float] = {}
+        # Null fills used for appended rows, fixed at the first append so the
+        # same rows always clean to the same values
+        self.fill_values: Dict[str, Dict[str, Any]] = {}
 
     async def process_csv(self, file_content: bytes, task_id: str) -> ProcessingResult:
         """Process CSV with comprehensive error handling and progress logging"""
@@ -30,7 +38,8 @@ class CSVProcessor:
 
             # Read CSV with error handling
             try:
-                df = pl.read_csv(io.BytesIO(file_content))
+                with STAGE_LATENCY.time("process_csv", "read_csv"):
+                    df = pl.read_csv(io.BytesIO(file_content))
             except Exception as e:
                 await self.manager.send_log(
                     task_id, "error", f"Failed to read CSV: {str(e)}", 0
@@ -64,9 +73,13 @@ class CSVProcessor:
             await self.manager.send_log(
                 task_id, "info", "Removing empty columns...", 40
             )
-            empty_cols = [col for col in df.columns if df[col].null_count() == len(df)]
+            with STAGE_LATENCY.time("process_csv", "remove_empty_columns"):
+                empty_cols = [
+                    col for col in df.columns if df[col].null_count() == len(df)
+                ]
+                if empty_cols:
+                    df = df.drop(empty_cols)
             if empty_cols:
-                df = df.drop(empty_cols)
                 await self.manager.send_log(
                     task_id, "info", f"Removed {len(empty_cols)} empty columns", 45
                 )
@@ -77,7 +90,8 @@ class CSVProcessor:
                 task_id, "info", "Removing duplicate rows...", 50
             )
             original_len = len(df)
-            df = df.unique()
+            with STAGE_LATENCY.time("process_csv", "deduplicate"):
+                df = df.unique()
             duplicates = original_len - len(df)
             if duplicates > 0:
                 await self.manager.send_log(
@@ -89,14 +103,15 @@ class CSVProcessor:
             await self.manager.send_log(
                 task_id, "info", "Handling missing values...", 70
             )
-            for col in df.columns:
-                null_count = df[col].null_count()
-                if null_count > 0:
-                    if df[col].dtype in [pl.Int64, pl.Float64]:
-                        median_val = df[col].median()
-                        df = df.with_columns(df[col].fill_null(median_val))
-                    else:
-                        df = df.with_columns(df[col].fill_null("Unknown"))
+            with STAGE_LATENCY.time("process_csv", "fill_missing"):
+                for col in df.columns:
+                    null_count = df[col].null_count()
+                    if null_count > 0:
+                        if df[col].dtype in [pl.Int64, pl.Float64]:
+                            median_val = df[col].median()
+                            df = df.with_columns(df[col].fill_null(median_val))
+                        else:
+                            df = df.with_columns(df[col].fill_null("Unknown"))
             await asyncio.sleep(1)
 
             await self.manager.send_log(task_id, "info", "Filled missing values", 75)
@@ -118,16 +133,17 @@ class CSVProcessor:
             ]
 
             target_columns = []
-            for col in df.columns:
-                try:
-                    unique_count = df[col].n_unique()
-                    if any(kw in col.lower() for kw in excluded_keywords):
+            with STAGE_LATENCY.time("process_csv", "detect_targets"):
+                for col in df.columns:
+                    try:
+                        unique_count = df[col].n_unique()
+                        if any(kw in col.lower() for kw in excluded_keywords):
+                            continue
+                        if unique_count < 10 and unique_count > 1:
+                            target_columns.append(col)
+                    except Exception:
+                        # Skip columns that can't be analyzed
                         continue
-                    if unique_count < 10 and unique_count > 1:
-                        target_columns.append(col)
-                except Exception:
-                    # Skip columns that can't be analyzed
-                    continue
 
             await asyncio.sleep(1)
             await self.manager.send_log(
@@ -139,6 +155,7 @@ class CSVProcessor:
 
             # Store results
             self.processed_data[task_id] = df
+            self.last_used[task_id] = time.monotonic()
             result = ProcessingResult(
                 task_id=task_id,
                 success=True,
@@ -208,8 +225,97 @@ class CSVProcessor:
 
     def get_processed_data(self, task_id: str) -> pl.DataFrame:
         """Get processed DataFrame"""
+        if task_id in self.processed_data:
+            self.last_used[task_id] = time.monotonic()
         return self.processed_data.get(task_id)
 
+    def discard(self, task_id: str):
+        """Forget a finished task's data and result"""
+        self.processed_data.pop(task_id, None)
+        self.processing_results.pop(task_id, None)
+        self.last_used.pop(task_id, None)
+        self.fill_values.pop(task_id, None)
+
+    def append_rows(self, task_id: str, new_rows: pl.DataFrame) -> pl.DataFrame:
+        """
+        Clean new rows like the initial processing and append them to a
+        task's frame. Rows already in the frame, or repeated in new_rows, are
+        dropped. Raises ValueError naming the columns whose values do not fit
+        the frame's types. Returns the cleaned rows that were appended.
+        """
+        df = self.processed_data.get(task_id)
+        if df is None:
+            raise KeyError(task_id)
+        missing = [col for col in df.columns if col not in new_rows.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+        # Extra columns are dropped and values cast to the frame's types. A
+        # value that does not cast is rejected rather than imputed as missing
+        columns, invalid = [], []
+        for col, dtype in df.schema.items():
+            try:
+                columns.append(new_rows[col].cast(dtype, strict=True))
+            except pl.exceptions.PolarsError:
+                invalid.append(f"{col} ({dtype})")
+        if invalid:
+            raise ValueError(f"Values do not match the column type: {', '.join(invalid)}")
+        received_rows = new_rows.height
+        new_rows = pl.DataFrame(columns).unique()
+        fill_values = self.fill_values.setdefault(task_id, {})
+        fills = []
+        for col in df.columns:
+            if new_rows[col].null_count() == 0:
+                continue
+            dtype = df[col].dtype
+            if dtype in [pl.Int64, pl.Float64]:
+                median = fill_values.setdefault(col, df[col].median())
+                fills.append(pl.col(col).fill_null(median).cast(dtype))
+            elif dtype == pl.Utf8:
+                fills.append(pl.col(col).fill_null("Unknown"))
+        if fills:
+            new_rows = new_rows.with_columns(fills)
+        new_rows = new_rows.join(df, on=df.columns, how="anti", nulls_equal=True)
+
+        # A new frame object, so caches keyed on the frame rebuild on next use
+        df = self.processed_data[task_id] = pl.concat([df, new_rows])
+
+        result = self.processing_results.get(task_id)
+        if result is not None:
+            original_rows = result.original_rows + received_rows
+            self.processing_results[task_id] = result.model_copy(
+                update={
+                    "original_rows": original_rows,
+                    "cleaned_rows": len(df),
+                    "summary": f"Processed [{original_rows}x{len(df.columns)}] > {len(df)} rows, {len(df.columns)} columns",
+                }
+            )
+        return new_rows
+
+    def get_memory_report(self) -> Dict[str, Any]:
+        """Get memory used by every stored DataFrame, largest first"""
+        tasks = {}
+        for task_id, df in self.processed_data.items():
+            usage = frame_memory_usage(df)
+            tasks[task_id] = {
+                "rows": df.shape[0],
+                "columns": df.shape[1],
+                "total_bytes": usage["total_bytes"],
+                "total_mb": usage["total_mb"],
+            }
+
+        tasks = dict(
+            sorted(tasks.items(), key=lambda item: item[1]["total_bytes"], reverse=True)
+        )
+        total_bytes = sum(task["total_bytes"] for task in tasks.values())
+
+        return {
+            "task_count": len(tasks),
+            "total_bytes": total_bytes,
+            "total_mb": round(total_bytes / (1024 * 1024), 2),
+            "tasks": tasks,
+        }
+
     def cancel_task(self, task_id: str):
         """Cancel a running task"""
         if task_id in self.active_tasks:
@@ -0,0 +1,202 @@
+import asyncio
+import io
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import polars as pl
+
+from ..connection_manager import ConnectionManager
+from .ingestion_pipeline import CSVProcessor
+from .ml_pipeline import MLProcessor
+from .training_jobs import TrainingJobManager
+from ..utils import setup_logger
+
+# Leading part of an upload parsed to estimate its in-memory size
+ESTIMATE_SAMPLE_BYTES = 1024 * 1024
+
+
+def estimate_parsed_size(content: bytes) -> int:
+    """
+    Estimate the in-memory size of a CSV once parsed, by parsing a leading
+    sample of whole lines and scaling its bytes-per-input-byte ratio.
+    """
+    sample = content[:ESTIMATE_SAMPLE_BYTES]
+    if len(sample) < len(content):
+        sample = sample[: sample.rfind(b"\n") + 1] or sample
+    try:
+        parsed = pl.read_csv(io.BytesIO(sample))
+    except Exception:
+        return len(content)
+    if parsed.height == 0:
+        return len(content)
+    return int(len(content) * parsed.estimated_size() / len(sample))
+
+
+class MemoryGovernor:
+    """
+    Keeps the memory held by tasks within a global budget. A task's usage is
+    its processed frame, its resident model, encoded matrix and finished
+    speculative models, and what the per-task caches hold for it. Tasks idle
+    for longer than ttl_seconds are evicted, then the least recently used
+    ones until usage fits the budget. Tasks being ingested or trained are
+    never evicted. Finished training jobs are forgotten after ttl_seconds.
+
+    Eviction drops the frame and every cache derived from it. A model saved
+    to the model store is only unloaded and reloads on its next use.
+    """
+
+    def __init__(
+        self,
+        csv_processor: CSVProcessor,
+        ml_processor: MLProcessor,
+        training_jobs: TrainingJobManager,
+        connection_manager: ConnectionManager,
+        caches: Sequence[Any] = (),
+        budget_bytes: int = 2 * 1024**3,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.csv_processor = csv_processor
+        self.ml_processor = ml_processor
+        self.training_jobs = training_jobs
+        self.manager = connection_manager
+        # Per-task caches exposing memory_usage() and invalidate(task_id),
+        # e.g. charts and rows
+        self.caches = list(caches)
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.refused_uploads = 0
+        self.logger = setup_logger(__name__)
+
+    def task_usage(self) -> Dict[str, Dict[str, int]]:
+        """Bytes held per task, split into data, models and caches"""
+        usage: Dict[str, Dict[str, int]] = {}
+
+        def task(task_id: str) -> Dict[str, int]:
+            return usage.setdefault(
+                task_id, {"data_bytes": 0, "model_bytes": 0, "cache_bytes": 0}
+            )
+
+        for task_id, df in list(self.csv_processor.processed_data.items()):
+            task(task_id)["data_bytes"] = int(df.estimated_size())
+
+        models = self.ml_processor.memory_usage()
+        for (task_id, _), (_, model_data) in list(
+            self.training_jobs.speculative_results.items()
+        ):
+            models[task_id] = models.get(task_id, 0) + self.ml_processor.model_nbytes(
+                model_data["model"]
+            )
+        for task_id, model_bytes in models.items():
+            task(task_id)["model_bytes"] = int(model_bytes)
+
+        for cache in self.caches:
+            for task_id, cache_bytes in cache.memory_usage().items():
+                task(task_id)["cache_bytes"] += int(cache_bytes)
+
+        for task_usage in usage.values():
+            task_usage["total_bytes"] = (
+                task_usage["data_bytes"]
+                + task_usage["model_bytes"]
+                + task_usage["cache_bytes"]
+            )
+        return usage
+
+    def report(self) -> Dict[str, Any]:
+        """Budget, current use and eviction counters"""
+        usage = self.task_usage()
+        used = sum(task["total_bytes"] for task in usage.values())
+        return {
+            "budget_bytes": self.budget_bytes,
+            "used_bytes": used,
+            "used_mb": round(used / (1024 * 1024), 2),
+            "used_ratio": round(used / self.budget_bytes, 4) if self.budget_bytes else 0.0,
+            "data_bytes": sum(task["data_bytes"] for task in usage.values()),
+            "model_bytes": sum(task["model_bytes"] for task in usage.values()),
+            "cache_bytes": sum(task["cache_bytes"] for task in usage.values()),
+            "tasks": len(usage),
+            "evictions": self.evictions,
+            "refused_uploads": self.refused_uploads,
+        }
+
+    def last_used(self, task_id: str) -> float:
+        return max(
+            self.csv_processor.last_used.get(task_id, 0.0),
+            self.ml_processor.last_used.get(task_id, 0.0),
+        )
+
+    def busy_tasks(self) -> set:
+        """Tasks that must stay in memory: being ingested or trained on request"""
+        busy = set(self.csv_processor.get_active_tasks())
+        busy.update(
+            self.training_jobs.jobs[job_id].task_id
+            for job_id in self.training_jobs.get_requested_jobs()
+        )
+        busy.update(self.ml_processor.pins)
+        return busy
+
+    def enforce(self, reserve_bytes: int = 0, keep: Sequence[str] = ()) -> List[str]:
+        """
+        Evict expired tasks, then least recently used ones until usage plus
+        reserve_bytes fits the budget. Tasks in keep are not evicted.
+        Returns the evicted task IDs.
+        """
+        usage = self.task_usage()
+        busy = self.busy_tasks().union(keep)
+        candidates = sorted(
+            (task_id for task_id in usage if task_id not in busy), key=self.last_used
+        )
+        used = sum(task["total_bytes"] for task in usage.values())
+        now = time.monotonic()
+
+        evicted = []
+        for task_id in candidates:
+            expired = (
+                self.ttl_seconds is not None
+                and now - self.last_used(task_id) > self.ttl_seconds
+            )
+            if not expired and used + reserve_bytes <= self.budget_bytes:
+                continue
+            self.evict(task_id)
+            used -= usage[task_id]["total_bytes"]
+            evicted.append(task_id)
+
+        if self.ttl_seconds is not None:
+            self.manager.drop_stale_queues(self.ttl_seconds)
+            self.training_jobs.prune_finished(self.ttl_seconds)
+        if evicted:
+            self.logger.info(
+                f"Evicted {len(evicted)} task(s), {used / (1024 * 1024):.1f} MB in use"
+            )
+        return evicted
+
+    def evict(self, task_id: str):
+        """Release everything held for a task"""
+        self.csv_processor.discard(task_id)
+        self.ml_processor.release(task_id)
+        self.training_jobs.discard_speculation(task_id)
+        for cache in self.caches:
+            cache.invalidate(task_id)
+        if not self.manager.get_connection_status(task_id):
+            self.manager.disconnect(task_id)  # Only drops its queued messages
+        self.evictions += 1
+
+    def admit(self, estimated_bytes: int, keep: Sequence[str] = ()) -> bool:
+        """
+        Make room for estimated_bytes of new data, or refuse it. Data appended
+        to a task passes it in keep, so making room never evicts that task.
+        """
+        self.enforce(reserve_bytes=estimated_bytes, keep=keep)
+        if self.report()["used_bytes"] + estimated_bytes <= self.budget_bytes:
+            return True
+        self.refused_uploads += 1
+        return False
+
+    async def run(self, interval: float):
+        """Enforce the budget and TTL every interval seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.enforce()
+            except Exception as e:
+                self.logger.error(f"Memory governor check failed: {e}")
@@ -1,257 +1,1232 @@
 import polars as pl
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, r2_score
+from sklearn.base import clone
 import joblib
+import copy
+import hashlib
 import os
-from typing import Dict, Any, Optional, Tuple
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 import logging
 
+from ..metrics import STAGE_LATENCY
+from .compiled_forest import COMPILED_MAX_ROWS, CompiledForest
+from .prediction_cache import PredictionCache
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Trees grown per warm-start step; progress and cancellation are checked between steps
+TREES_PER_STEP = 10
+# Gradient boosting re-bins the data and recomputes the predictions of every
+# existing iteration on each warm-start fit, so it grows in this many steps
+BOOSTING_STEPS = 4
+
+ENGINES = ("random_forest", "hist_gradient_boosting")
+# A time budget plans this share for the full-size fit (sized from a pilot fit
+# on PILOT_ROWS rows), and stops adding trees once FIT_DEADLINE_SHARE has passed
+BUDGET_PLAN_SHARE = 0.6
+FIT_DEADLINE_SHARE = 0.85
+PILOT_ROWS = 5_000
+# Histogram gradient boosting bins categories, so only this many fit natively
+MAX_NATIVE_CATEGORIES = 255
+# Incremental updates: trees (or boosting iterations) fitted on appended rows,
+# the fewest rows accepted, and how many of the newest trees a forest keeps
+UPDATE_TREES = 20
+MIN_UPDATE_ROWS = 20
+MAX_FOREST_TREES = 300
+# Size of one node in a fitted sklearn tree (its Node struct)
+TREE_NODE_BYTES = 64
+
+
+# Code given to categories that were not seen during training. Trees route it
+# as a missing value: a forest sends it to the child that had more training
+# samples at each split (no category is missing in training), and gradient
+# boosting to its missing-value branch. A number such as -1 would instead sit
+# below every threshold and always follow the path of the category coded 0
+UNSEEN_CATEGORY = np.nan
+
+
+class TrainingCancelled(Exception):
+    """Raised inside a fit when its job has been cancelled"""
+
+
+class CategoryTable:
+    """
+    Category -> code lookup for one feature, compiled once at training time.
+    Single rows use the hash map, batches the equivalent Polars key/code
+    Series, so both paths encode identically in O(1) per value.
+    """
+
+    def __init__(self, classes: np.ndarray):
+        self.codes: Dict[str, int] = {str(value): code for code, value in enumerate(classes)}
+        self.keys = pl.Series("keys", list(self.codes.keys()), dtype=pl.String)
+        self.values = pl.Series("codes", list(self.codes.values()), dtype=pl.Float32)
+
+    @staticmethod
+    def _normalize(value: Any) -> str:
+        return "missing" if value is None else str(value)
+
+    def encode_value(self, value: Any) -> float:
+        return self.codes.get(self._normalize(value), UNSEEN_CATEGORY)
+
+    def is_unseen(self, value: Any) -> bool:
+        return self._normalize(value) not in self.codes
+
+    def encode_expr(self, column: str) -> pl.Expr:
+        return (
+            pl.col(column)
+            .cast(pl.String)
+            .fill_null("missing")
+            .replace_strict(
+                self.keys, self.values, default=UNSEEN_CATEGORY, return_dtype=pl.Float32
+            )
+        )
+
+
+@dataclass(frozen=True)
+class EncodedFrame:
+    """
+    Every column of a frame encoded once into a float32 Fortran-order matrix.
+    Any column can then be the target and the rest the features.
+    """
+
+    matrix: np.ndarray
+    columns: Tuple[str, ...]
+    dtypes: Dict[str, pl.DataType]
+    encoders: Dict[str, LabelEncoder]
+
+    @property
+    def height(self) -> int:
+        return self.matrix.shape[0]
+
+    def feature_indices(self, target_column: str) -> np.ndarray:
+        """Matrix column positions of every column except the target"""
+        return np.array(
+            [i for i, column in enumerate(self.columns) if column != target_column],
+            dtype=np.intp,
+        )
+
+    def take(self, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        """Gather a row/column subset in one copy, keeping Fortran order"""
+        # Gathering on the C-order transpose and transposing back yields F order
+        return self.matrix.T[np.ix_(columns, rows)].T
+
+
+@dataclass
+class TrainingSplit:
+    """Features, target and the 80/20 row split used to fit and score a model"""
+
+    features: np.ndarray
+    feature_columns: List[str]
+    feature_encoders: Dict[str, LabelEncoder]
+    target_encoder: Optional[LabelEncoder]
+    is_classification: bool
+    train_rows: np.ndarray
+    test_rows: np.ndarray
+    y_train: np.ndarray
+    y_test: np.ndarray
+
 
 class MLProcessor:
-    def __init__(self):
+    def __init__(self, model_dir: Optional[str] = None, max_resident_models: int = 8):
         self.models = {}
         self.label_encoders = {}
         self.model_info = {}
         self.feature_columns = {}
+        self.category_tables: Dict[str, Dict[str, CategoryTable]] = {}
+        self.compiled_models: Dict[str, CompiledForest] = {}
+        # Bumped on every (re)training so cached predictions never go stale
+        self.model_versions: Dict[str, int] = {}
+        self.prediction_cache = PredictionCache(max_entries=4096)
+        # Encoded matrices per task, tied to the frame they were built from
+        self.encoded_frames: Dict[str, EncodedFrame] = {}
+        self.encoded_sources: Dict[str, pl.DataFrame] = {}
+
+        # Registry: with a model_dir every trained model is saved there, and only
+        # the max_resident_models most recently used stay in memory. Evicted
+        # models keep their model_info and feature list and reload on demand
+        self.model_dir = model_dir
+        self.max_resident_models = max_resident_models
+        self.resident: "OrderedDict[str, None]" = OrderedDict()
+        self.pins: Dict[str, int] = {}
+        # Bytes held by each resident model, and when each task last used one
+        self.model_sizes: Dict[str, int] = {}
+        self.last_used: Dict[str, float] = {}
+        self._registry_lock = threading.RLock()
+        # One incremental update per task at a time, each building on the last
+        self.update_locks: Dict[str, threading.Lock] = {}
 
-    def prepare_data(
-        self, df: pl.DataFrame, target_column: str
-    ) -> Tuple[np.ndarray, np.ndarray, Dict, Optional[LabelEncoder]]:
-        """Prepare data for training by handling categorical variables"""
-        # Separate features and target
-        X = df.drop(target_column)
-        y = df[target_column]
+    @staticmethod
+    def is_categorical(dtype: pl.DataType) -> bool:
+        return dtype in (pl.Utf8, pl.Categorical)
 
-        # Convert to numpy arrays for sklearn
-        X_processed = X.to_numpy()
-        y_array = y.to_numpy()
+    @staticmethod
+    def _label_encode(series: pl.Series) -> Tuple[pl.Series, LabelEncoder]:
+        """
+        Label-encode a text column in Polars. Codes are ranks among the sorted
+        distinct values, matching LabelEncoder.fit_transform on the same data.
+        """
+        values = series.cast(pl.Utf8).fill_null("missing")
+        encoder = LabelEncoder()
+        encoder.classes_ = values.unique().sort().to_numpy().astype(str)
+        codes = values.rank("dense") - 1
+        return codes, encoder
 
-        # Handle categorical variables in features
+    def encode_frame(self, df: pl.DataFrame) -> EncodedFrame:
+        """
+        Encode every column into a float32 Fortran-order matrix, one column at
+        a time, so no object array is built and sklearn uses it without
+        copying. Text columns are label-encoded and numeric nulls become NaN.
+        """
+        matrix = np.empty((df.height, df.width), dtype=np.float32, order="F")
         encoders = {}
-        feature_columns = X.columns
-
-        # Process categorical columns
-        for i, column in enumerate(feature_columns):
-            if df[column].dtype == pl.Utf8:  # String/categorical column
-                le = LabelEncoder()
-                # Handle null values by converting to string
-                col_data = df[column].fill_null("missing").to_numpy().astype(str)
-                X_processed[:, i] = le.fit_transform(col_data)
-                encoders[column] = le
-
-        # Handle target variable if it's categorical
-        target_encoder = None
-        if df[target_column].dtype == pl.Utf8:
-            target_encoder = LabelEncoder()
-            # Handle null values in target
-            y_data = df[target_column].fill_null("missing").to_numpy().astype(str)
-            y_array = target_encoder.fit_transform(y_data)
-
-        return X_processed, y_array, encoders, target_encoder
+        for i, column in enumerate(df.columns):
+            series = df[column]
+            if self.is_categorical(series.dtype):
+                series, encoders[column] = self._label_encode(series)
+            matrix[:, i] = series.cast(pl.Float32).to_numpy()
+
+        return EncodedFrame(
+            matrix=matrix,
+            columns=tuple(df.columns),
+            dtypes=dict(df.schema),
+            encoders=encoders,
+        )
+
+    def get_encoded(self, task_id: str, df: pl.DataFrame) -> EncodedFrame:
+        """Encoded matrix for a task's frame, built once per frame"""
+        if self.encoded_sources.get(task_id) is not df:
+            with STAGE_LATENCY.time("train", "encode"):
+                self.encoded_frames[task_id] = self.encode_frame(df)
+            self.encoded_sources[task_id] = df
+        return self.encoded_frames[task_id]
+
+    def invalidate(self, task_id: str):
+        """Drop the cached encoded matrix for a task"""
+        self.encoded_frames.pop(task_id, None)
+        self.encoded_sources.pop(task_id, None)
+
+    def _target_values(
+        self, encoded: EncodedFrame, target: pl.Series
+    ) -> Tuple[np.ndarray, Optional[LabelEncoder]]:
+        """Target array and encoder, reusing the codes of a text target"""
+        if target.name in encoded.encoders:
+            index = encoded.columns.index(target.name)
+            return encoded.matrix[:, index].astype(np.int64), encoded.encoders[target.name]
+        return target.to_numpy(), None
 
     def train_model(
-        self, task_id: str, df: pl.DataFrame, target_column: str
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        target_column: str,
+        engine: str = "random_forest",
+        time_budget: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """Train a Random Forest model"""
+        """Train a Random Forest (or gradient boosting) model"""
         try:
             if target_column not in df.columns:
                 raise ValueError(f"Target column '{target_column}' not found in data")
 
-            # Prepare data
-            X, y, feature_encoders, target_encoder = self.prepare_data(
-                df, target_column
+            model_data = self.fit_encoded(
+                self.get_encoded(task_id, df),
+                df[target_column],
+                engine=engine,
+                time_budget=time_budget,
             )
+            result = self.register_model(task_id, model_data)
+            self.persist_model(task_id)
 
-            # Determine if it's classification or regression
-            unique_values = np.unique(y)
-            is_classification = (
-                df[target_column].dtype == pl.Utf8
-                or len(unique_values) < 10
-                or target_encoder is not None
+            logger.info(
+                f"Model trained for task {task_id}: "
+                f"{result['score_name']} = {result['score']:.4f}"
             )
+            return result
 
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                X,
-                y,
-                test_size=0.2,
-                random_state=42,
-                stratify=y if is_classification else None,
+        except Exception as e:
+            logger.error(f"Error training model for task {task_id}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def split_training_data(self, encoded: EncodedFrame, target: pl.Series) -> TrainingSplit:
+        """Pick the features, encode the target and split rows 80/20"""
+        features = encoded.feature_indices(target.name)
+        y, target_encoder = self._target_values(encoded, target)
+        feature_columns = [encoded.columns[i] for i in features]
+
+        # Determine if it's classification or regression
+        unique_values = np.unique(y)
+        is_classification = (
+            self.is_categorical(target.dtype)
+            or len(unique_values) < 10
+            or target_encoder is not None
+        )
+
+        # Split row indices, so features are gathered in one copy per split
+        train_rows, test_rows, y_train, y_test = train_test_split(
+            np.arange(encoded.height),
+            y,
+            test_size=0.2,
+            random_state=42,
+            stratify=y if is_classification else None,
+        )
+        return TrainingSplit(
+            features=features,
+            feature_columns=feature_columns,
+            feature_encoders={
+                column: encoded.encoders[column]
+                for column in feature_columns
+                if column in encoded.encoders
+            },
+            target_encoder=target_encoder,
+            is_classification=is_classification,
+            train_rows=train_rows,
+            test_rows=test_rows,
+            y_train=y_train,
+            y_test=y_test,
+        )
+
+    def fit_encoded(
+        self,
+        encoded: EncodedFrame,
+        target: pl.Series,
+        progress: Optional[Callable[[str, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        engine: str = "random_forest",
+        time_budget: Optional[float] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fit on an already encoded frame. The target's matrix column is masked
+        out of the features, so the encoding is never repeated.
+
+        With a time_budget (seconds) the training rows are subsampled to what
+        a pilot fit predicts will fit in the budget, and the model stops
+        growing if it runs late. model_info reports the rows and trees used.
+        params override the engine's default hyperparameters.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {list(ENGINES)}")
+        started = time.monotonic()
+        target_column = target.name
+        report = progress or (lambda message, percent: None)
+        report("Preparing data", 5)
+
+        split = self.split_training_data(encoded, target)
+        features, feature_columns = split.features, split.feature_columns
+        feature_encoders, target_encoder = split.feature_encoders, split.target_encoder
+        is_classification = split.is_classification
+        train_rows, test_rows = split.train_rows, split.test_rows
+        y_train, y_test = split.y_train, split.y_test
+
+        def make_model():
+            return self._make_model(
+                engine, is_classification, feature_encoders, feature_columns
+            ).set_params(**(params or {}))
+
+        if time_budget is not None:
+            # Train on as many rows as the budget allows, and score on a
+            # proportionally smaller test set
+            n_rows = self._affordable_rows(
+                make_model, encoded, features, train_rows, y_train, time_budget, started
             )
+            rng = np.random.default_rng(42)
+            if n_rows < len(train_rows):
+                keep = np.sort(rng.choice(len(train_rows), n_rows, replace=False))
+                train_rows, y_train = train_rows[keep], y_train[keep]
+            n_test = max(n_rows // 4, 1000)
+            if n_test < len(test_rows):
+                keep = np.sort(rng.choice(len(test_rows), n_test, replace=False))
+                test_rows, y_test = test_rows[keep], y_test[keep]
 
-            # Train model
-            if is_classification:
-                model = RandomForestClassifier(n_estimators=100, random_state=42)
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                score = accuracy_score(y_test, y_pred)
-                score_name = "Accuracy"
-            else:
-                model = RandomForestRegressor(n_estimators=100, random_state=42)
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                score = r2_score(y_test, y_pred)
-                score_name = "R² Score"
-
-            # Store model and encoders
-            self.models[task_id] = model
-            self.label_encoders[task_id] = {
+        X_train = encoded.take(train_rows, features)
+        X_test = encoded.take(test_rows, features)
+
+        # Train model
+        model = make_model()
+        deadline = (
+            started + time_budget * FIT_DEADLINE_SHARE if time_budget is not None else None
+        )
+        n_estimators = self._fit_steps(model, X_train, y_train, report, should_stop, deadline)
+
+        report("Scoring model", 95)
+        y_pred = model.predict(X_test)
+        if is_classification:
+            score = accuracy_score(y_test, y_pred)
+            score_name = "Accuracy"
+        else:
+            score = r2_score(y_test, y_pred)
+            score_name = "R² Score"
+
+        return {
+            "model": model,
+            "encoders": {
                 "features": feature_encoders,
                 "target": target_encoder,
-            }
-            self.feature_columns[task_id] = list(df.drop(target_column).columns)
-
-            # Store model info
-            self.model_info[task_id] = {
+            },
+            "feature_columns": feature_columns,
+            "category_tables": self.compile_category_tables(feature_encoders),
+            "model_info": {
                 "target_column": target_column,
-                "feature_columns": list(df.drop(target_column).columns),
+                "feature_columns": feature_columns,
                 "feature_types": {
-                    col: str(df[col].dtype) for col in df.drop(target_column).columns
+                    col: str(encoded.dtypes[col]) for col in feature_columns
                 },
                 "model_type": "classification" if is_classification else "regression",
-                "score": score,
+                "score": float(score),  # Ensure score is a native Python float
                 "score_name": score_name,
-                "n_samples": len(df),
-                "n_features": len(df.drop(target_column).columns),
-            }
+                "n_samples": int(encoded.height),  # Ensure it's a native Python int
+                "n_features": int(len(feature_columns)),
+                "engine": engine,
+                "training_samples": int(len(train_rows)),
+                "n_estimators": int(n_estimators),
+                "training_seconds": round(time.monotonic() - started, 3),
+                "params": params or {},
+            },
+        }
 
-            logger.info(f"Model trained for task {task_id}: {score_name} = {score:.4f}")
+    @staticmethod
+    def _make_model(
+        engine: str,
+        is_classification: bool,
+        feature_encoders: Dict[str, LabelEncoder],
+        feature_columns: List[str],
+    ):
+        if engine == "hist_gradient_boosting":
+            # Label-encoded columns are split on as categories, not as numbers
+            categorical = [
+                column in feature_encoders
+                and len(feature_encoders[column].classes_) <= MAX_NATIVE_CATEGORIES
+                for column in feature_columns
+            ]
+            params = dict(
+                max_iter=200,
+                random_state=42,
+                categorical_features=categorical if any(categorical) else None,
+            )
+            if is_classification:
+                return HistGradientBoostingClassifier(**params)
+            return HistGradientBoostingRegressor(**params)
 
-            return {
-                "success": True,
-                "model_type": "classification" if is_classification else "regression",
-                "score": float(score),  # Ensure score is a native Python float
-                "score_name": score_name,
-                "feature_columns": list(df.drop(target_column).columns),
-                "feature_types": {
-                    col: str(df[col].dtype) for col in df.drop(target_column).columns
-                },
-                "n_samples": int(len(df)),  # Ensure it's a native Python int
-                "n_features": int(
-                    len(df.drop(target_column).columns)
-                ),  # Ensure it's a native Python int
+        if is_classification:
+            return RandomForestClassifier(n_estimators=100, random_state=42)
+        return RandomForestRegressor(n_estimators=100, random_state=42)
+
+    @staticmethod
+    def _size_param(model) -> str:
+        """Parameter that sets how many trees a model grows"""
+        return "max_iter" if "max_iter" in model.get_params() else "n_estimators"
+
+    @staticmethod
+    def _fitted_size(model) -> int:
+        if hasattr(model, "n_iter_"):
+            return model.n_iter_
+        return len(getattr(model, "estimators_", []))
+
+    def _affordable_rows(
+        self,
+        make_model: Callable[[], Any],
+        encoded: EncodedFrame,
+        features: np.ndarray,
+        train_rows: np.ndarray,
+        y_train: np.ndarray,
+        time_budget: float,
+        started: float,
+    ) -> int:
+        """
+        Number of training rows a full fit can use within the budget. One step
+        is timed on two pilot samples to fit a fixed cost plus a per-row cost,
+        and each later step is assumed to cost about the same as the first.
+        """
+        if len(train_rows) <= PILOT_ROWS:
+            return len(train_rows)
+
+        pilot = np.random.default_rng(0).choice(len(train_rows), PILOT_ROWS, replace=False)
+        sizes = (PILOT_ROWS // 5, PILOT_ROWS)
+        timings = []
+        for size in sizes:
+            model = make_model()
+            param = self._size_param(model)
+            steps = max(model.get_params()[param] // TREES_PER_STEP, 1)
+            model.set_params(**{param: TREES_PER_STEP})
+
+            rows = np.sort(pilot[:size])
+            pilot_started = time.monotonic()
+            model.fit(encoded.take(train_rows[rows], features), y_train[rows])
+            timings.append(time.monotonic() - pilot_started)
+
+        # Guard the slope against timing noise on the small sample
+        per_row = max(
+            (timings[1] - timings[0]) / (sizes[1] - sizes[0]), timings[1] / sizes[1] / 4
+        )
+        fixed = max(timings[1] - per_row * sizes[1], 0.0)
+
+        remaining = time_budget * BUDGET_PLAN_SHARE - (time.monotonic() - started)
+        affordable = int((remaining / steps - fixed) / per_row)
+        return int(np.clip(affordable, PILOT_ROWS, len(train_rows)))
+
+    def _fit_steps(
+        self,
+        model,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        report: Callable[[str, int], None],
+        should_stop: Optional[Callable[[], bool]],
+        deadline: Optional[float] = None,
+        sample_weight: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Grow the model in steps with warm_start so progress can be reported and
+        cancellation checked between steps. sklearn advances the seed sequence
+        past existing trees, so a forest matches a single fit. A fitted model
+        continues from the trees it has. Stops early when the next step would
+        pass the deadline, or when gradient boosting's own early stopping ends
+        it. Returns the number of trees in the model.
+
+        Forests grow TREES_PER_STEP trees per step. Every boosting step costs
+        a refit's worth of overhead, so boosting runs in BOOSTING_STEPS steps
+        (about 2.8 times a single fit for 200 iterations, against 7.7 with
+        steps of TREES_PER_STEP).
+        """
+        param = self._size_param(model)
+        total = model.get_params()[param]
+        # Trees scan one feature at a time, so keep the split column-major
+        X_train = np.asfortranarray(X_train, dtype=np.float32)
+
+        model.set_params(warm_start=True)
+        fitted, step_seconds = self._fitted_size(model), 0.0
+        step = TREES_PER_STEP
+        if param == "max_iter":
+            step = max(-(-(total - fitted) // BOOSTING_STEPS), TREES_PER_STEP)
+        start = fitted + step
+        for size in range(start, total + step, step):
+            if should_stop is not None and should_stop():
+                raise TrainingCancelled("Training was cancelled")
+            if size > start and deadline is not None and time.monotonic() + step_seconds > deadline:
+                report(f"Time budget reached after {fitted} trees", 90)
+                break
+
+            step_started = time.monotonic()
+            model.set_params(**{param: min(size, total)})
+            model.fit(X_train, y_train, sample_weight=sample_weight)
+            step_seconds = time.monotonic() - step_started
+
+            fitted = self._fitted_size(model)
+            report(f"Trained {fitted}/{total} trees", 10 + int(80 * fitted / total))
+            if fitted < min(size, total):
+                break  # Early stopping on the validation score
+
+        # Leave the parameters describing the model that was actually fitted
+        model.set_params(warm_start=False, **{param: fitted})
+        return fitted
+
+    def update_model(
+        self,
+        task_id: str,
+        new_rows: pl.DataFrame,
+        progress: Optional[Callable[[str, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Refresh a task's model with appended rows only, so the cost follows
+        the size of the new data. A forest gets UPDATE_TREES trees fitted on
+        the new rows and keeps its newest MAX_FOREST_TREES; gradient boosting
+        runs UPDATE_TREES more iterations on them. New categories are appended
+        to the feature encoders, keeping existing codes and splits valid.
+
+        Both the old and the updated model are scored on a 20% holdout of the
+        new rows, and the result reports the drift between those two scores.
+        """
+        started = time.monotonic()
+        report = progress or (lambda message, percent: None)
+        if new_rows.height < MIN_UPDATE_ROWS:
+            raise ValueError(f"At least {MIN_UPDATE_ROWS} new rows are needed")
+
+        with self._registry_lock:
+            update_lock = self.update_locks.setdefault(task_id, threading.Lock())
+        with update_lock:
+            return self._update_model(task_id, new_rows, report, should_stop, started)
+
+    def _update_model(
+        self,
+        task_id: str,
+        new_rows: pl.DataFrame,
+        report: Callable[[str, int], None],
+        should_stop: Optional[Callable[[], bool]],
+        started: float,
+    ) -> Dict[str, Any]:
+        with self.using_model(task_id):
+            if task_id not in self.models:
+                raise ValueError(f"No model found for task {task_id}")
+            model = self.models[task_id]
+            info = self.model_info[task_id]
+            encoders = self.label_encoders[task_id]
+            feature_columns = self.feature_columns[task_id]
+            target_column = info["target_column"]
+            missing = [
+                column
+                for column in [*feature_columns, target_column]
+                if column not in new_rows.columns
+            ]
+            if missing:
+                raise ValueError(f"Missing required column: {', '.join(missing)}")
+
+            report("Encoding new rows", 5)
+            feature_encoders = {
+                column: self._extend_encoder(encoder, new_rows[column])
+                for column, encoder in encoders["features"].items()
             }
+            tables = self.compile_category_tables(feature_encoders)
+            X = self._encode_columns(new_rows, feature_columns, tables)
+            y = self._update_target(model, encoders["target"], new_rows[target_column])
+
+            train_rows, test_rows = train_test_split(
+                np.arange(new_rows.height), test_size=0.2, random_state=42
+            )
+            if info["model_type"] == "classification":
+                score_rows = accuracy_score
+            else:
+                score_rows = r2_score
+            pre_update_score = score_rows(y[test_rows], model.predict(X[test_rows]))
+
+            with STAGE_LATENCY.time("update", "fit"):
+                updated = self._grow(
+                    model, X[train_rows], y[train_rows], report, should_stop
+                )
+
+        report("Scoring model", 95)
+        score = score_rows(y[test_rows], updated.predict(X[test_rows]))
+        model_data = {
+            "model": updated,
+            "encoders": {"features": feature_encoders, "target": encoders["target"]},
+            "feature_columns": feature_columns,
+            "category_tables": tables,
+            "model_info": {
+                **info,
+                "score": float(score),
+                "n_samples": int(info["n_samples"] + new_rows.height),
+                "training_samples": int(
+                    (info.get("training_samples") or 0) + len(train_rows)
+                ),
+                "n_estimators": int(self._fitted_size(updated)),
+                "training_seconds": round(time.monotonic() - started, 3),
+                "updates": info.get("updates", 0) + 1,
+                "previous_score": float(info["score"]),
+                "pre_update_score": float(pre_update_score),
+                # Both scores are on the same holdout of the new rows
+                "score_drift": float(score - pre_update_score),
+            },
+        }
+        result = self.register_model(task_id, model_data)
+        self.persist_model(task_id)
+        logger.info(
+            f"Model updated for task {task_id} with {new_rows.height} rows: "
+            f"{result['score_name']} {info['score']:.4f} -> {score:.4f}"
+        )
+        return result
+
+    def _grow(
+        self,
+        model,
+        X: np.ndarray,
+        y: np.ndarray,
+        report: Callable[[str, int], None],
+        should_stop: Optional[Callable[[], bool]],
+    ):
+        """A copy of a fitted model with UPDATE_TREES more trees fitted on X, y"""
+        X, y, weight = self._anchor_classes(model, X, y)
+
+        if isinstance(model, (RandomForestClassifier, RandomForestRegressor)):
+            # Trees never change once fitted, so the update shares them with the
+            # live model and only fits the new ones
+            fitted = len(model.estimators_)
+            extra = clone(model).set_params(
+                n_estimators=UPDATE_TREES, random_state=42 + fitted
+            )
+            self._fit_steps(extra, X, y, report, should_stop, sample_weight=weight)
+            updated = copy.copy(model)
+            updated.estimators_ = (model.estimators_ + extra.estimators_)[
+                -MAX_FOREST_TREES:
+            ]
+            updated.set_params(n_estimators=len(updated.estimators_))
+            return updated
+
+        # Boosting continues from the current ensemble. The copy is small, and
+        # the new rows are too few to hold out an early stopping split
+        updated = copy.deepcopy(model)
+        updated.set_params(max_iter=model.n_iter_ + UPDATE_TREES, early_stopping=False)
+        with self._fixed_binning(updated):
+            self._fit_steps(updated, X, y, report, should_stop, sample_weight=weight)
+        return updated
+
+    @staticmethod
+    @contextmanager
+    def _fixed_binning(model) -> Iterator[None]:
+        """
+        Make warm-start fits of a gradient boosting model encode and bin rows
+        with its fitted category encoder and bin mapper. sklearn refits both
+        on every fit, so new rows would shift the category codes and bin
+        thresholds the existing trees split on. Categories the model has not
+        seen fall into the missing-value bin, as they do at prediction time.
+        """
+        bin_mapper = model._bin_mapper
+        preprocess = model._preprocess_X
+
+        def preprocess_X(X, *, reset):
+            X = preprocess(X, reset=False)
+            return (X, None) if reset else X
+
+        def bin_data(X, is_training_data):
+            model._bin_mapper = bin_mapper  # fit just built a fresh one
+            X_binned = bin_mapper.transform(X)
+            return X_binned if is_training_data else np.ascontiguousarray(X_binned)
+
+        model._preprocess_X, model._bin_data = preprocess_X, bin_data
+        try:
+            yield
+        finally:
+            # Drop the overrides, so the model pickles and refits normally
+            del model._preprocess_X, model._bin_data
+            model._bin_mapper = bin_mapper
+
+    @staticmethod
+    def _anchor_classes(
+        model, X: np.ndarray, y: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Add a zero-weight row for every class missing from y. sklearn derives
+        a classifier's classes from the fitted labels, and new trees must
+        predict the same classes as the existing ones.
+        """
+        if not hasattr(model, "classes_"):
+            return X, y, None
+        missing = np.setdiff1d(model.classes_, y)
+        if not len(missing):
+            return X, y, None
+        X = np.concatenate([X, np.repeat(X[:1], len(missing), axis=0)])
+        y = np.concatenate([y, missing.astype(y.dtype)])
+        weight = np.ones(len(y))
+        weight[-len(missing) :] = 0
+        return X, y, weight
+
+    @staticmethod
+    def _extend_encoder(encoder: LabelEncoder, series: pl.Series) -> LabelEncoder:
+        """The encoder with unseen values appended, after the existing codes"""
+        known = set(encoder.classes_)
+        values = series.cast(pl.Utf8).fill_null("missing").unique().to_list()
+        new = np.array(sorted(value for value in values if value not in known), dtype=str)
+        if not len(new):
+            return encoder
+        extended = LabelEncoder()
+        extended.classes_ = np.concatenate([encoder.classes_, new])
+        return extended
+
+    @staticmethod
+    def _update_target(
+        model, target_encoder: Optional[LabelEncoder], target: pl.Series
+    ) -> np.ndarray:
+        """Target values of new rows, rejecting classes the model has not seen"""
+        if target_encoder is not None:
+            table = CategoryTable(target_encoder.classes_)
+            codes = target.to_frame().select(table.encode_expr(target.name)).to_series()
+            codes = codes.to_numpy()
+            unseen = target.filter(pl.Series(np.isnan(codes))).unique().to_list()
+            y = np.nan_to_num(codes).astype(np.int64)
+        else:
+            y = target.to_numpy()
+            unseen = []
+            if hasattr(model, "classes_"):
+                unseen = np.setdiff1d(y, model.classes_).tolist()
+        if unseen:
+            raise ValueError(
+                f"New target classes {unseen[:5]} need a full retrain with /train"
+            )
+        return y
 
+    @staticmethod
+    def compile_category_tables(
+        feature_encoders: Dict[str, LabelEncoder],
+    ) -> Dict[str, CategoryTable]:
+        """Build a lookup table for every label-encoded feature"""
+        return {
+            column: CategoryTable(encoder.classes_)
+            for column, encoder in feature_encoders.items()
+        }
+
+    def register_model(self, task_id: str, model_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a fitted model bundle for a task and return the training summary"""
+        with self._registry_lock:
+            self._install(task_id, model_data)
+            self.model_versions[task_id] = self.model_versions.get(task_id, 0) + 1
+            self.prediction_cache.invalidate(task_id)
+            self._evict()
+        return self.summarize(model_data)
+
+    @staticmethod
+    def summarize(model_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Training summary of a fitted model bundle"""
+        info = model_data["model_info"]
+        return {
+            "success": True,
+            "model_type": info["model_type"],
+            "score": info["score"],
+            "score_name": info["score_name"],
+            "feature_columns": info["feature_columns"],
+            "feature_types": info["feature_types"],
+            "n_samples": info["n_samples"],
+            "n_features": info["n_features"],
+            "engine": info.get("engine", "random_forest"),
+            "training_samples": info.get("training_samples"),
+            "n_estimators": info.get("n_estimators"),
+            "training_seconds": info.get("training_seconds"),
+            "params": info.get("params"),
+            "cv_score": info.get("cv_score"),
+            "updates": info.get("updates", 0),
+            "previous_score": info.get("previous_score"),
+            "pre_update_score": info.get("pre_update_score"),
+            "score_drift": info.get("score_drift"),
+        }
+
+    def _install(self, task_id: str, model_data: Dict[str, Any]):
+        """Put a model bundle in memory as the most recently used model"""
+        self.models[task_id] = model_data["model"]
+        self.label_encoders[task_id] = model_data["encoders"]
+        self.feature_columns[task_id] = model_data["feature_columns"]
+        self.model_info[task_id] = model_data["model_info"]
+        # Bundles saved before tables existed get them compiled on load
+        self.category_tables[task_id] = model_data.get(
+            "category_tables"
+        ) or self.compile_category_tables(model_data["encoders"]["features"])
+        # Forests are compiled on their first small batch, see compiled_model
+        self.compiled_models.pop(task_id, None)
+        self.model_sizes[task_id] = self.model_nbytes(model_data["model"])
+        self.resident[task_id] = None
+        self.resident.move_to_end(task_id)
+        self.last_used[task_id] = time.monotonic()
+
+    def compiled_model(self, task_id: str) -> Optional[CompiledForest]:
+        """
+        The compiled forest of a task's model, built on first use. Only models
+        that serve small batches pay for it, and its size is added to the
+        model's once it exists. None for models that are not forests.
+        """
+        compiled = self.compiled_models.get(task_id)
+        if compiled is not None:
+            return compiled
+        model = self.models[task_id]
+        if not isinstance(model, (RandomForestClassifier, RandomForestRegressor)):
+            return None
+
+        compiled = CompiledForest(model)
+        with self._registry_lock:
+            # Kept only if the model was not replaced or unloaded meanwhile
+            if self.models.get(task_id) is model and task_id not in self.compiled_models:
+                self.compiled_models[task_id] = compiled
+                self.model_sizes[task_id] += compiled.nbytes
+        return compiled
+
+    @staticmethod
+    def model_nbytes(model) -> int:
+        """Memory held by a fitted tree ensemble's nodes and leaf values"""
+        if hasattr(model, "_predictors"):  # Histogram gradient boosting
+            return sum(
+                predictor.nodes.nbytes
+                for iteration in model._predictors
+                for predictor in iteration
+            )
+        return sum(
+            tree.tree_.node_count * TREE_NODE_BYTES + tree.tree_.value.nbytes
+            for tree in getattr(model, "estimators_", [])
+        )
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held per task by its resident model and encoded matrix"""
+        usage = dict(self.model_sizes)
+        for task_id, encoded in list(self.encoded_frames.items()):
+            usage[task_id] = usage.get(task_id, 0) + encoded.matrix.nbytes
+        return usage
+
+    def release(self, task_id: str) -> bool:
+        """
+        Free the memory a task's model and encoded matrix hold. A saved model
+        is only unloaded and comes back on next use; an unsaved one is
+        forgotten. Returns False if the model is in use.
+        """
+        with self._registry_lock:
+            if task_id in self.pins:
+                return False
+            path = self.model_path(task_id)
+            if path is None or not os.path.exists(path):
+                for store in (self.model_info, self.feature_columns, self.model_versions):
+                    store.pop(task_id, None)
+            self._unload(task_id)
+            self.last_used.pop(task_id, None)
+            self.update_locks.pop(task_id, None)
+        self.prediction_cache.invalidate(task_id)
+        self.invalidate(task_id)
+        return True
+
+    def _unload(self, task_id: str):
+        """Drop a model from memory, keeping its model_info and feature list"""
+        for store in (
+            self.models,
+            self.label_encoders,
+            self.category_tables,
+            self.compiled_models,
+            self.model_sizes,
+        ):
+            store.pop(task_id, None)
+        self.resident.pop(task_id, None)
+
+    def model_path(self, task_id: str) -> Optional[str]:
+        """File a task's model is persisted to, or None without a model_dir"""
+        if not self.model_dir:
+            return None
+        # Task IDs are UUIDs; anything else is hashed into a safe filename
+        name = task_id
+        if not re.fullmatch(r"[A-Za-z0-9_-]{1,100}", task_id):
+            name = hashlib.sha256(task_id.encode()).hexdigest()
+        return os.path.join(self.model_dir, f"{name}.joblib")
+
+    def persist_model(self, task_id: str):
+        """Save a registered model to the model directory, if there is one"""
+        path = self.model_path(task_id)
+        if path is None:
+            return
+        try:
+            # Created on first save, so importing the app leaves no directory
+            os.makedirs(self.model_dir, exist_ok=True)
+            # Write then rename, so a concurrent load never sees a partial file
+            self.save_model(task_id, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
         except Exception as e:
-            logger.error(f"Error training model for task {task_id}: {str(e)}")
-            return {"success": False, "error": str(e)}
+            logger.error(f"Error saving model for task {task_id}: {str(e)}")
+
+    def ensure_loaded(self, task_id: str) -> bool:
+        """Make a task's model resident, loading it from disk if needed"""
+        with self._registry_lock:
+            if task_id in self.models:
+                self.resident[task_id] = None
+                self.resident.move_to_end(task_id)
+                self.last_used[task_id] = time.monotonic()
+                return True
+
+            path = self.model_path(task_id)
+            if path is None or not os.path.exists(path):
+                return False
+
+            self._install(task_id, joblib.load(path))
+            os.utime(path)  # Recently used models are warmed up first
+            self._evict()
+            logger.info(f"Loaded model for task {task_id} from {path}")
+            return True
+
+    @contextmanager
+    def using_model(self, task_id: str):
+        """Keep a task's model resident for the duration of a prediction"""
+        with self._registry_lock:
+            loaded = self.ensure_loaded(task_id)
+            if loaded:
+                self.pins[task_id] = self.pins.get(task_id, 0) + 1
+        try:
+            yield
+        finally:
+            if loaded:
+                with self._registry_lock:
+                    self.pins[task_id] -= 1
+                    if not self.pins[task_id]:
+                        del self.pins[task_id]
+
+    def _evict(self):
+        """Unload least recently used models beyond the residency limit"""
+        if not self.model_dir:
+            return  # Without a model_dir an evicted model could not come back
+
+        excess = len(self.resident) - self.max_resident_models
+        for task_id in list(self.resident):
+            if excess <= 0:
+                break
+            if task_id in self.pins or not os.path.exists(self.model_path(task_id)):
+                continue
+            self._unload(task_id)
+            excess -= 1
+
+    def warm_up(self, count: int) -> List[str]:
+        """Load the most recently used persisted models, up to count"""
+        if not self.model_dir or count <= 0 or not os.path.isdir(self.model_dir):
+            return []
+        paths = sorted(
+            (
+                os.path.join(self.model_dir, name)
+                for name in os.listdir(self.model_dir)
+                if name.endswith(".joblib")
+            ),
+            key=os.path.getmtime,
+            reverse=True,
+        )[: min(count, self.max_resident_models)]
+
+        loaded = []
+        for path in reversed(paths):  # Most recent last, so it ends up MRU
+            model_data = joblib.load(path)
+            # Older files carry no task_id, but their name is the task ID
+            task_id = model_data.get("task_id") or os.path.basename(path)[: -len(".joblib")]
+            with self._registry_lock:
+                self._install(task_id, model_data)
+                self._evict()
+            loaded.append(task_id)
+        return loaded
 
     def predict(self, task_id: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Make predictions using the trained model"""
-        try:
-            if task_id not in self.models:
-                raise ValueError(f"No model found for task {task_id}")
+        return self.predict_many(task_id, [input_data])[0]
 
-            model = self.models[task_id]
-            feature_encoders = self.label_encoders[task_id]["features"]
-            target_encoder = self.label_encoders[task_id]["target"]
-            expected_columns = self.feature_columns[task_id]
-
-            # Prepare input data as Polars DataFrame
-            input_df = pl.DataFrame([input_data])
-
-            # Ensure all expected columns are present
-            for col in expected_columns:
-                if col not in input_df.columns:
-                    raise ValueError(f"Missing required feature: {col}")
-
-            # Reorder columns to match training data
-            input_df = input_df.select(expected_columns)
-
-            # Convert to numpy for processing
-            input_array = input_df.to_numpy()
-
-            # Apply feature encoders
-            for i, column in enumerate(expected_columns):
-                if column in feature_encoders:
-                    encoder = feature_encoders[column]
-                    try:
-                        # Convert to string and handle unseen categories
-                        value = str(input_array[0, i])
-                        if value in encoder.classes_:
-                            input_array[0, i] = encoder.transform([value])[0]
-                        else:
-                            # Handle unseen categories by using the most frequent class
-                            input_array[0, i] = 0  # Default to first category
-                    except Exception as e:
-                        logger.warning(f"Error encoding column {column}: {e}")
-                        input_array[0, i] = 0
-
-            # Make prediction
-            prediction_raw = model.predict(input_array.reshape(1, -1))[0]
-
-            # Get prediction probabilities for classification
-            prediction_proba = None
-            if hasattr(model, "predict_proba"):
-                proba = model.predict_proba(input_array.reshape(1, -1))[0]
-                if target_encoder:
-                    # Map probabilities to class names
-                    class_names = target_encoder.classes_
-                    prediction_proba = {
-                        str(class_names[i]): float(prob) for i, prob in enumerate(proba)
-                    }
-                else:
-                    prediction_proba = {
-                        f"Class_{i}": float(prob) for i, prob in enumerate(proba)
-                    }
-
-            # Decode target if it was encoded
-            if target_encoder:
-                try:
-                    prediction = target_encoder.inverse_transform(
-                        [int(prediction_raw)]
-                    )[0]
-                    # Convert to native Python type
-                    prediction = (
-                        str(prediction)
-                        if isinstance(prediction, (np.str_, np.unicode_))
-                        else prediction
-                    )
-                except Exception as e:
-                    logger.warning(f"Error decoding prediction: {e}")
-                    prediction = prediction_raw
+    def predict_many(
+        self, task_id: str, rows: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Predict several independent inputs with one model call. Each row gets
+        the same result predict would return, and a row that fails to encode
+        only fails itself. Rows already in the prediction cache, or repeated
+        within the call, are not predicted again.
+        """
+        with self.using_model(task_id):
+            return self._predict_many(task_id, rows)
+
+    def _predict_many(
+        self, task_id: str, rows: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+        version = self.model_versions.get(task_id, 0)
+        predictions: Dict[bytes, Tuple[Any, Optional[Dict[str, float]]]] = {}
+        pending: Dict[bytes, np.ndarray] = {}
+        keys: Dict[int, bytes] = {}
+
+        encode_started = time.perf_counter()
+        for position, input_data in enumerate(rows):
+            try:
+                X = self.encode_row(task_id, input_data)
+            except Exception as e:
+                logger.error(f"Error making prediction for task {task_id}: {str(e)}")
+                results[position] = {"success": False, "error": str(e)}
+                continue
+
+            # The encoded row is the canonical form of the input
+            key = keys[position] = X.tobytes()
+            if key in predictions or key in pending:
+                continue
+            cached = self.prediction_cache.get(task_id, version, key)
+            if cached is not None:
+                predictions[key] = cached
             else:
-                prediction = prediction_raw
-
-            # Convert numpy types to native Python types for JSON serialization
-            if isinstance(prediction, (np.integer, np.int64, np.int32)):
-                prediction = int(prediction)
-            elif isinstance(prediction, (np.floating, np.float64, np.float32)):
-                prediction = float(prediction)
-            elif isinstance(prediction, (np.str_, np.unicode_)):
-                prediction = str(prediction)
-            elif isinstance(prediction, np.ndarray):
-                prediction = prediction.tolist()
-
-            return {
-                "success": True,
-                "prediction": prediction,
-                "prediction_proba": prediction_proba,
-                "input_data": input_data,
-                "model_type": self.model_info[task_id]["model_type"],
-            }
+                pending[key] = X
+        STAGE_LATENCY.observe(
+            time.perf_counter() - encode_started, "predict", "encode"
+        )
+
+        try:
+            if pending:
+                with STAGE_LATENCY.time("predict", "infer"):
+                    labels, proba, class_names = self._predict_matrix(
+                        task_id, np.vstack(list(pending.values()))
+                    )
+                for i, key in enumerate(pending):
+                    prediction_proba = None
+                    if proba is not None:
+                        prediction_proba = {
+                            name: float(prob) for name, prob in zip(class_names, proba[i])
+                        }
+                    predictions[key] = (labels[i].item(), prediction_proba)
+                    self.prediction_cache.put(task_id, version, key, predictions[key])
+
+            model_type = self.model_info[task_id]["model_type"]
+            tables = self.category_tables[task_id]
+            for position, key in keys.items():
+                input_data = rows[position]
+                prediction, prediction_proba = predictions[key]
+                unseen = [
+                    column
+                    for column, table in tables.items()
+                    if table.is_unseen(input_data.get(column))
+                ]
+                results[position] = {
+                    "success": True,
+                    "prediction": prediction,
+                    "prediction_proba": (
+                        dict(prediction_proba) if prediction_proba is not None else None
+                    ),
+                    "input_data": input_data,
+                    "model_type": model_type,
+                    "unseen_categories": unseen or None,
+                }
 
         except Exception as e:
             logger.error(f"Error making prediction for task {task_id}: {str(e)}")
-            return {"success": False, "error": str(e)}
+            for position in keys:
+                results[position] = {"success": False, "error": str(e)}
+
+        return results
+
+    def validate_input(self, task_id: str, columns: List[str]):
+        """Check a model exists for the task and the input has all its features"""
+        if not self.ensure_loaded(task_id):
+            raise ValueError(f"No model found for task {task_id}")
+
+        missing = [col for col in self.feature_columns[task_id] if col not in columns]
+        if missing:
+            raise ValueError(f"Missing required feature: {', '.join(missing)}")
+
+    def encode_row(self, task_id: str, input_data: Dict[str, Any]) -> np.ndarray:
+        """Encode one input row with the compiled hash-map lookups"""
+        self.validate_input(task_id, list(input_data.keys()))
+        tables = self.category_tables[task_id]
+
+        row = []
+        for column in self.feature_columns[task_id]:
+            value = input_data[column]
+            if column in tables:
+                row.append(tables[column].encode_value(value))
+            else:
+                row.append(np.nan if value is None else float(value))
+        return np.array([row], dtype=np.float32)
+
+    def encode_features(self, task_id: str, input_df: pl.DataFrame) -> np.ndarray:
+        """
+        Encode input rows into the model's feature matrix, one vectorized
+        Polars expression per column using the compiled category tables.
+        """
+        self.validate_input(task_id, input_df.columns)
+        return self._encode_columns(
+            input_df, self.feature_columns[task_id], self.category_tables[task_id]
+        )
+
+    @staticmethod
+    def _encode_columns(
+        df: pl.DataFrame, feature_columns: List[str], tables: Dict[str, CategoryTable]
+    ) -> np.ndarray:
+        expressions = [
+            (
+                tables[column].encode_expr(column)
+                if column in tables
+                else pl.col(column).cast(pl.Float32)
+            )
+            for column in feature_columns
+        ]
+        return df.select(expressions).to_numpy()
+
+    def _predict_matrix(
+        self, task_id: str, X: np.ndarray
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], List[str]]:
+        """
+        Predict an encoded matrix. Classifiers run a single predict_proba and
+        take labels from its argmax instead of walking the forest twice. Small
+        batches go through the compiled forest, which gives identical outputs
+        without sklearn's per-call overhead.
+        Returns the decoded labels, class probabilities and class names.
+        """
+        model = self.models[task_id]
+        is_classifier = hasattr(model, "predict_proba")
+        if len(X) <= COMPILED_MAX_ROWS:
+            model = self.compiled_model(task_id) or model
+        target_encoder = self.label_encoders[task_id]["target"]
+
+        if not is_classifier:
+            return model.predict(X), None, []
+
+        proba = model.predict_proba(X)
+        labels = model.classes_[np.argmax(proba, axis=1)]
+
+        if target_encoder is not None:
+            labels = target_encoder.classes_[labels.astype(int)]
+            class_names = [
+                str(name) for name in target_encoder.classes_[model.classes_.astype(int)]
+            ]
+        else:
+            class_names = [f"Class_{i}" for i in range(proba.shape[1])]
+
+        return labels, proba, class_names
+
+    def predict_frame(self, task_id: str, input_df: pl.DataFrame) -> pl.DataFrame:
+        """Predict a batch of rows"""
+        with self.using_model(task_id):
+            return self._predict_encoded(task_id, self.encode_input(task_id, input_df))
+
+    def encode_input(self, task_id: str, input_df: pl.DataFrame) -> np.ndarray:
+        """
+        encode_features for client input, raising ValueError when a value
+        cannot be cast to its feature's type
+        """
+        with STAGE_LATENCY.time("predict", "encode"):
+            try:
+                return self.encode_features(task_id, input_df)
+            except pl.exceptions.PolarsError as e:
+                raise ValueError(f"Invalid input values: {e}") from e
+
+    def _predict_encoded(self, task_id: str, X: np.ndarray) -> pl.DataFrame:
+        with STAGE_LATENCY.time("predict", "infer"):
+            labels, proba, class_names = self._predict_matrix(task_id, X)
+
+        if proba is None:
+            return pl.DataFrame({"prediction": labels})
+
+        probabilities = pl.DataFrame(
+            {name: proba[:, i] for i, name in enumerate(class_names)}
+        )
+        return pl.DataFrame(
+            {
+                "prediction": labels.tolist(),
+                "prediction_proba": probabilities.to_struct(),
+            }
+        )
+
+    def predict_batches(
+        self, task_id: str, input_df: pl.DataFrame, batch_size: int = 10_000
+    ) -> Iterator[bytes]:
+        """
+        Predict rows in fixed-size batches, yielding each batch as NDJSON.
+        All rows are encoded before this returns, so invalid values raise
+        ValueError here rather than cutting a started response short.
+        """
+        with self.using_model(task_id):
+            X = self.encode_input(task_id, input_df)
+        return self._stream_predictions(task_id, X, batch_size)
+
+    def _stream_predictions(
+        self, task_id: str, X: np.ndarray, batch_size: int
+    ) -> Iterator[bytes]:
+        for start in range(0, len(X), batch_size):
+            with self.using_model(task_id):
+                batch = self._predict_encoded(task_id, X[start : start + batch_size])
+            yield batch.write_ndjson().encode()
 
     def get_model_info(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get model information"""
+        if task_id not in self.model_info:
+            self.ensure_loaded(task_id)
         return self.model_info.get(task_id)
 
     def save_model(self, task_id: str, filepath: str):
         """Save model to disk"""
         if task_id in self.models:
             model_data = {
+                "task_id": task_id,
                 "model": self.models[task_id],
                 "encoders": self.label_encoders[task_id],
                 "feature_columns": self.feature_columns[task_id],
+                "category_tables": self.category_tables[task_id],
                 "model_info": self.model_info[task_id],
             }
             joblib.dump(model_data, filepath)
@@ -259,8 +1234,4 @@ class MLProcessor:
     def load_model(self, task_id: str, filepath: str):
         """Load model from disk"""
         if os.path.exists(filepath):
-            model_data = joblib.load(filepath)
-            self.models[task_id] = model_data["model"]
-            self.label_encoders[task_id] = model_data["encoders"]
-            self.feature_columns[task_id] = model_data["feature_columns"]
-            self.model_info[task_id] = model_data["model_info"]
+            self.register_model(task_id, joblib.load(filepath))
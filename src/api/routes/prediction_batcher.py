@@ -0,0 +1,119 @@
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+from .ml_pipeline import MLProcessor
+from ..utils import setup_logger
+
+
+class PredictionBatcher:
+    """
+    Groups concurrent single-row predictions for the same model into one
+    vectorized call. Requests that queue up while a model is busy, plus those
+    arriving within a short collection window (up to max_batch_size), share
+    one inference run off the event loop, and each caller gets back its own
+    result. A request reaching an idle model is scored at once, so batches
+    grow with concurrency without delaying light traffic.
+    """
+
+    def __init__(
+        self,
+        ml_processor: MLProcessor,
+        window_ms: float = 2.0,
+        max_batch_size: int = 32,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.ml_processor = ml_processor
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+        self.logger = setup_logger(__name__)
+
+    async def predict(
+        self, task_id: str, input_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Queue one input for the task's model and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        queue = self.queues.setdefault(task_id, asyncio.Queue())
+        queue.put_nowait((input_data, future))
+
+        # One worker per model, started on demand and stopped once idle
+        if task_id not in self.workers:
+            self.workers[task_id] = asyncio.create_task(self._run(task_id, queue))
+        return await future
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Requests waiting per task"""
+        # Read from the /metrics render thread while the event loop edits queues
+        return {task_id: queue.qsize() for task_id, queue in list(self.queues.items())}
+
+    async def _run(self, task_id: str, queue: asyncio.Queue):
+        batch = []
+        busy = False
+        try:
+            while not queue.empty():
+                # An idle model answers a lone request at once; the window only
+                # applies once requests are already backing up
+                batch = await self._collect(queue, wait=busy)
+                busy = True
+                rows = [input_data for input_data, _ in batch]
+                try:
+                    results = await asyncio.to_thread(self._predict, task_id, rows)
+                except Exception as e:
+                    self.logger.error(
+                        f"Batched prediction for task {task_id} failed: {e}"
+                    )
+                    results = [{"success": False, "error": str(e)}] * len(batch)
+
+                for (_, future), result in zip(batch, results):
+                    if not future.done():  # The caller may have gone away
+                        future.set_result(result)
+        finally:
+            # Only non-empty if the worker was cancelled mid-batch
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            # No await between the empty check and here, so nothing is stranded
+            self.workers.pop(task_id, None)
+            if queue.empty():
+                self.queues.pop(task_id, None)
+
+    async def _collect(
+        self, queue: asyncio.Queue, wait: bool
+    ) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        """Take queued requests, plus those arriving within the window if wait"""
+        batch = [queue.get_nowait()]
+        deadline = asyncio.get_running_loop().time() + (self.window if wait else 0)
+
+        while len(batch) < self.max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _predict(
+        self, task_id: str, rows: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if len(rows) == 1:
+            return [self.ml_processor.predict(task_id, rows[0])]
+        return self.ml_processor.predict_many(task_id, rows)
+
+    def shutdown(self):
+        """Stop the workers, failing any requests still waiting"""
+        for worker in self.workers.values():
+            worker.cancel()
+        for queue in self.queues.values():
+            while not queue.empty():
+                _, future = queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+        self.workers.clear()
+        self.queues.clear()
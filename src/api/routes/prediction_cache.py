@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results, keyed by task, model version and
+    the encoded input row. Two inputs that encode to the same feature vector
+    (key order, "1.5" vs 1.5, extra fields, different unseen categories) share
+    an entry. Thread-safe, since batched predictions run in worker threads.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, int, Hashable], Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, task_id: str, version: int, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self.entries.get((task_id, version, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end((task_id, version, key))
+            self.hits += 1
+            return value
+
+    def put(self, task_id: str, version: int, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self.entries[(task_id, version, key)] = value
+            self.entries.move_to_end((task_id, version, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, task_id: str):
+        """Drop every cached result of a task"""
+        with self._lock:
+            for entry in [entry for entry in self.entries if entry[0] == task_id]:
+                del self.entries[entry]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
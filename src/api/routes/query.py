@@ -0,0 +1,200 @@
+import re
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+
+import polars as pl
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+    | (?P<op>==|!=|<=|>=|<|>|=)
+    | (?P<punct>[(),])
+    | (?P<ident>`[^`]+`|[A-Za-z_][A-Za-z0-9_.]*)
+    """,
+    re.VERBOSE,
+)
+KEYWORDS = {"and", "in", "not", "between", "true", "false", "null"}
+MAX_QUERY_LENGTH = 2000
+
+
+@dataclass(frozen=True)
+class FilterQuery:
+    """Parsed filter: a Polars predicate plus the columns it reads"""
+
+    expr: pl.Expr
+    columns: Tuple[str, ...]
+    normalized: str
+
+
+def parse_filter(text: str) -> FilterQuery:
+    """
+    Parse a filter expression into a Polars predicate.
+
+    Clauses are joined with `and` and each one is one of:
+        column == value    (also !=, <, <=, >, >=; `=` is the same as `==`)
+        column in (value, ...) / column not in (value, ...)
+        column between low and high
+
+    Values are numbers, quoted strings, true/false or null. Column names with
+    spaces or punctuation are written in backticks.
+
+    Raises:
+        ValueError: If the expression cannot be parsed.
+    """
+    if len(text) > MAX_QUERY_LENGTH:
+        raise ValueError(f"Filter is too long (max {MAX_QUERY_LENGTH} characters)")
+
+    parser = _Parser(_tokenize(text))
+    clauses = parser.parse()
+
+    exprs = [expr for expr, _, _ in clauses]
+    columns = tuple(sorted({column for _, column, _ in clauses}))
+    # AND is commutative, so sorted clauses give one cache key per query
+    normalized = " and ".join(sorted(rendered for _, _, rendered in clauses))
+
+    return FilterQuery(
+        expr=pl.all_horizontal(exprs), columns=columns, normalized=normalized
+    )
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise ValueError(
+                f"Unexpected character at position {position}: '{text[position]}'"
+            )
+        position = match.end()
+
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "ws":
+            continue
+        if kind == "ident" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser over the token list"""
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self) -> List[Tuple[pl.Expr, str, str]]:
+        if not self.tokens:
+            raise ValueError("Filter is empty")
+
+        clauses = [self._clause()]
+        while self._peek() == ("keyword", "and"):
+            self.position += 1
+            clauses.append(self._clause())
+
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected token '{self.tokens[self.position][1]}'")
+        return clauses
+
+    def _peek(self) -> Tuple[str, str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return ("end", "")
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token[0] == "end":
+            raise ValueError("Unexpected end of filter")
+        self.position += 1
+        return token
+
+    def _expect(self, kind: str, value: str):
+        token = self._next()
+        if token != (kind, value):
+            raise ValueError(f"Expected '{value}', got '{token[1]}'")
+
+    def _clause(self) -> Tuple[pl.Expr, str, str]:
+        kind, name = self._next()
+        if kind != "ident":
+            raise ValueError(f"Expected a column name, got '{name}'")
+        column = name[1:-1] if name.startswith("`") else name
+        col = pl.col(column)
+        label = f"`{column}`"
+
+        kind, op = self._next()
+        if kind == "op":
+            op = "==" if op == "=" else op
+            value = self._value()
+            return self._comparison(col, op, value), column, f"{label} {op} {value!r}"
+
+        if (kind, op) == ("keyword", "not"):
+            self._expect("keyword", "in")
+            values = self._value_list()
+            return ~self._membership(col, values), column, f"{label} not in {tuple(values)!r}"
+
+        if (kind, op) == ("keyword", "in"):
+            values = self._value_list()
+            return self._membership(col, values), column, f"{label} in {tuple(values)!r}"
+
+        if (kind, op) == ("keyword", "between"):
+            low = self._value()
+            self._expect("keyword", "and")
+            high = self._value()
+            return (
+                col.is_between(low, high, closed="both"),
+                column,
+                f"{label} between {low!r} and {high!r}",
+            )
+
+        raise ValueError(f"Unknown operator '{op}'")
+
+    @staticmethod
+    def _comparison(col: pl.Expr, op: str, value: Any) -> pl.Expr:
+        if value is None:
+            if op == "==":
+                return col.is_null()
+            if op == "!=":
+                return col.is_not_null()
+            raise ValueError(f"Operator '{op}' cannot compare with null")
+
+        return {
+            "==": col == value,
+            "!=": col != value,
+            "<": col < value,
+            "<=": col <= value,
+            ">": col > value,
+            ">=": col >= value,
+        }[op]
+
+    @staticmethod
+    def _membership(col: pl.Expr, values: List[Any]) -> pl.Expr:
+        present = [value for value in values if value is not None]
+        expr = col.is_in(pl.Series(present, strict=False).implode())
+        if len(present) < len(values):
+            expr = expr | col.is_null()
+        return expr
+
+    def _value(self) -> Any:
+        kind, value = self._next()
+        if kind == "number":
+            return int(value) if re.fullmatch(r"-?\d+", value) else float(value)
+        if kind == "string":
+            return re.sub(r"\\(.)", r"\1", value[1:-1])
+        if kind == "keyword" and value in ("true", "false"):
+            return value == "true"
+        if kind == "keyword" and value == "null":
+            return None
+        raise ValueError(f"Expected a value, got '{value}'")
+
+    def _value_list(self) -> List[Any]:
+        self._expect("punct", "(")
+        values = [self._value()]
+        while self._peek() == ("punct", ","):
+            self.position += 1
+            values.append(self._value())
+        self._expect("punct", ")")
+        return values
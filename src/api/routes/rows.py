@@ -0,0 +1,167 @@
+import base64
+import binascii
+import io
+import json
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import polars as pl
+
+from .charts import ARROW_STREAM_MEDIA_TYPE
+
+ROW_FORMATS = ["ndjson", "arrow"]
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+DEFAULT_BATCH_SIZE = 1000
+# Sort permutations kept per task, least recently used dropped first
+MAX_SORT_ORDERS = 4
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class RowBrowser:
+    """Cursor-paginated row access to stored frames, streamed in batches"""
+
+    def __init__(self):
+        # Sort permutations per task, tied to the frame they were computed from
+        self.sort_indices: Dict[str, "OrderedDict[Tuple, pl.Series]"] = {}
+        self.indexed_frames: Dict[str, pl.DataFrame] = {}
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by each task's cached sort permutations"""
+        return {
+            task_id: sum(int(index.estimated_size()) for index in list(indices.values()))
+            for task_id, indices in list(self.sort_indices.items())
+        }
+
+    def invalidate(self, task_id: str):
+        """Drop cached sort orders for a task"""
+        self.sort_indices.pop(task_id, None)
+        self.indexed_frames.pop(task_id, None)
+
+    @staticmethod
+    def parse_sort(sort: Optional[str]) -> Tuple[Tuple[str, bool], ...]:
+        """Parse `col1,-col2` into (column, descending) pairs"""
+        if not sort:
+            return ()
+        keys = []
+        for part in sort.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            descending = part.startswith("-")
+            keys.append((part.lstrip("+-"), descending))
+        return tuple(keys)
+
+    @staticmethod
+    def encode_cursor(offset: int, sort_key: Tuple[Tuple[str, bool], ...]) -> str:
+        payload = json.dumps({"offset": offset, "sort": sort_key}).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort_key: Tuple[Tuple[str, bool], ...]) -> int:
+        """Offset stored in a cursor, checking it belongs to the same sort order"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            offset = int(payload["offset"])
+            cursor_sort = tuple(tuple(key) for key in payload["sort"])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise ValueError("Invalid cursor")
+
+        if cursor_sort != sort_key:
+            raise ValueError("Cursor was created with a different sort order")
+        if offset < 0:
+            raise ValueError("Invalid cursor")
+        return offset
+
+    def _sort_index(
+        self, task_id: str, df: pl.DataFrame, sort_key: Tuple[Tuple[str, bool], ...]
+    ) -> pl.Series:
+        """
+        Row permutation for a sort order, computed once per frame. Up to
+        MAX_SORT_ORDERS permutations are kept per task.
+        """
+        if self.indexed_frames.get(task_id) is not df:
+            self.sort_indices[task_id] = OrderedDict()
+            self.indexed_frames[task_id] = df
+
+        indices = self.sort_indices[task_id]
+        if sort_key in indices:
+            indices.move_to_end(sort_key)
+            return indices[sort_key]
+
+        columns = [column for column, _ in sort_key]
+        descending = [desc for _, desc in sort_key]
+        index = indices[sort_key] = df.select(
+            pl.arg_sort_by(columns, descending=descending, nulls_last=True)
+        ).to_series()
+        while len(indices) > MAX_SORT_ORDERS:
+            indices.popitem(last=False)
+        return index
+
+    def page(
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        limit: int,
+        cursor: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        sort: Optional[str] = None,
+    ) -> Tuple[pl.DataFrame, Optional[str]]:
+        """
+        Get one page of rows and the cursor of the next page (None at the end).
+        Unsorted pages are zero-copy slices of the stored frame; sorted pages
+        gather only their own rows through a cached sort permutation.
+        """
+        sort_key = self.parse_sort(sort)
+        offset = self.decode_cursor(cursor, sort_key) if cursor else 0
+
+        if columns:
+            missing = [col for col in columns if col not in df.columns]
+            if missing:
+                raise ValueError(f"Column(s) not found: {missing}")
+        missing_sort = [col for col, _ in sort_key if col not in df.columns]
+        if missing_sort:
+            raise ValueError(f"Sort column(s) not found: {missing_sort}")
+
+        projected = df.select(columns) if columns else df
+        if sort_key:
+            index = self._sort_index(task_id, df, sort_key).slice(offset, limit)
+            page = projected[index]
+        else:
+            page = projected.slice(offset, limit)
+
+        next_offset = offset + len(page)
+        next_cursor = (
+            self.encode_cursor(next_offset, sort_key)
+            if next_offset < df.height
+            else None
+        )
+        return page, next_cursor
+
+    @staticmethod
+    def stream(
+        page: pl.DataFrame, row_format: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Yield a page as NDJSON batches or as an Arrow IPC stream. A page is at
+        most 100k rows, so the Arrow stream is written in one call and sent in
+        fixed-size chunks.
+        """
+        if row_format == "arrow":
+            # Each chunk of the frame is written as one record batch
+            batches = pl.concat(
+                [
+                    page.slice(start, batch_size)
+                    for start in range(0, page.height, batch_size)
+                ]
+                or [page],
+                rechunk=False,
+            )
+            buffer = io.BytesIO()
+            batches.write_ipc_stream(buffer)
+            view = buffer.getbuffer()
+            for start in range(0, len(view), STREAM_CHUNK_BYTES):
+                yield bytes(view[start : start + STREAM_CHUNK_BYTES])
+            return
+
+        for start in range(0, page.height, batch_size):
+            yield page.slice(start, batch_size).write_ndjson().encode()
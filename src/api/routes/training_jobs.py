@@ -0,0 +1,594 @@
+import asyncio
+import multiprocessing
+import queue
+import uuid
+from collections import deque
+from concurrent.futures import (
+    BrokenExecutor,
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+)
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import polars as pl
+from threadpoolctl import threadpool_limits
+
+from ..connection_manager import ConnectionManager
+from ..metrics import STAGE_LATENCY
+from ..models import TrainingJob, TrainModelResponse
+from .ml_pipeline import EncodedFrame, MLProcessor, TrainingCancelled
+from .tuning import describe_params, successive_halving
+from ..utils import setup_logger
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+POLL_INTERVAL = 0.2
+# Speculative jobs train with the /train defaults, so their result can answer it
+SPECULATIVE_ENGINE = "random_forest"
+
+
+class TrainingCapacityError(Exception):
+    """Raised when a job is submitted while too many jobs are pending"""
+
+
+def init_worker():
+    """Keep each worker on one core, so the pool size is the CPU budget"""
+    threadpool_limits(1)
+
+
+def run_training_job(
+    encoded: EncodedFrame,
+    target: pl.Series,
+    progress_queue,
+    cancel_event,
+    engine: str = "random_forest",
+    time_budget: Optional[float] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fit a model inside a worker process, reporting progress through a queue"""
+
+    def progress(message: str, percent: int):
+        progress_queue.put((message, percent))
+
+    return MLProcessor().fit_encoded(
+        encoded,
+        target,
+        progress=progress,
+        should_stop=cancel_event.is_set,
+        engine=engine,
+        time_budget=time_budget,
+        params=params,
+    )
+
+
+class TrainingJobManager:
+    """
+    Runs model training in a process pool as tracked, cancellable jobs.
+    max_concurrent is the CPU budget for all training: fits and tuning
+    evaluations share the pool, and each worker is limited to one thread.
+
+    Speculative jobs pre-train likely targets at low priority: they start
+    only while no requested job is active, one at a time, and are preempted
+    and requeued when requested jobs need their worker.
+    """
+
+    def __init__(
+        self,
+        ml_processor: MLProcessor,
+        connection_manager: ConnectionManager,
+        max_concurrent: int = 2,
+        max_pending: int = 16,
+    ):
+        self.ml_processor = ml_processor
+        self.manager = connection_manager
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.jobs: Dict[str, TrainingJob] = {}
+        self.futures: Dict[str, Future] = {}
+        self.cancel_events: Dict[str, Any] = {}
+        self.watchers: Dict[str, asyncio.Task] = {}
+        # Speculation: targets waiting for an idle pool, running jobs (by job
+        # ID) and finished bundles (by task and target), with their source frame
+        self.speculation_queue: Deque[Tuple[str, pl.DataFrame, str]] = deque()
+        self.speculative_jobs: Dict[str, pl.DataFrame] = {}
+        self.speculative_results: Dict[
+            Tuple[str, str], Tuple[pl.DataFrame, Dict[str, Any]]
+        ] = {}
+        self._speculator: Optional[asyncio.Task] = None
+        self.logger = setup_logger(__name__)
+
+        # Created on first use; spawn avoids forking a process with Polars threads
+        self._context = multiprocessing.get_context("spawn")
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._sync_manager = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_concurrent,
+                mp_context=self._context,
+                initializer=init_worker,
+            )
+        return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        """
+        Replace a pool broken by a worker that died (e.g. OOM-killed). Its
+        futures have already failed, so the next _get_pool starts a new one.
+        """
+        if self._pool is pool:
+            self.logger.warning("A training worker died, starting a new pool")
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _submit_work(self, fn, *args) -> Future:
+        """Submit to the pool, replacing it once if a dead worker broke it"""
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args)
+        except BrokenExecutor:
+            self._reset_pool(pool)
+            return self._get_pool().submit(fn, *args)
+
+    def _get_sync_manager(self):
+        if self._sync_manager is None:
+            self._sync_manager = self._context.Manager()
+        return self._sync_manager
+
+    def get_unfinished_jobs(self) -> List[str]:
+        """IDs of jobs that are queued or running"""
+        return [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.status not in FINISHED_STATUSES
+        ]
+
+    def get_requested_jobs(self) -> List[str]:
+        """IDs of unfinished jobs that were not started speculatively"""
+        return [
+            job_id
+            for job_id in self.get_unfinished_jobs()
+            if not self.jobs[job_id].speculative
+        ]
+
+    async def submit(
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        target_column: str,
+        engine: str = "random_forest",
+        time_budget: Optional[float] = None,
+        tune: bool = False,
+    ) -> TrainingJob:
+        """
+        Queue a training job and return immediately. With tune, a
+        hyperparameter search runs first and the best candidate is trained.
+        A matching speculative job is used instead of training again.
+        """
+        if len(self.get_requested_jobs()) >= self.max_pending:
+            raise TrainingCapacityError(
+                "Too many training jobs in progress, try again later"
+            )
+        if target_column not in df.columns:
+            raise ValueError(f"Target column '{target_column}' not found in data")
+
+        if engine == SPECULATIVE_ENGINE and time_budget is None and not tune:
+            job = await self._adopt_speculation(task_id, df, target_column)
+            if job is not None:
+                return job
+        # A requested job that would wait for a worker takes one from speculation
+        if tune or (
+            len(self.get_requested_jobs()) + len(self.speculative_jobs)
+            >= self.max_concurrent
+        ):
+            self._preempt_speculation()
+
+        return await self._submit(
+            task_id, df, target_column, engine, time_budget, tune, speculative=False
+        )
+
+    async def _submit(
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        target_column: str,
+        engine: str,
+        time_budget: Optional[float],
+        tune: bool,
+        speculative: bool,
+    ) -> TrainingJob:
+        # Encoding blocks, so run it off the event loop. The encoded matrix is
+        # cached per frame, so later jobs with another target reuse it
+        encoded = await asyncio.to_thread(self.ml_processor.get_encoded, task_id, df)
+
+        job_id = str(uuid.uuid4())
+        job = TrainingJob(
+            job_id=job_id,
+            task_id=task_id,
+            target_column=target_column,
+            engine=engine,
+            time_budget=time_budget,
+            tune=tune,
+            speculative=speculative,
+            status="queued",
+            message="Waiting for a free worker",
+            created_at=datetime.now().isoformat(),
+        )
+        self.jobs[job_id] = job
+        if speculative:
+            self.speculative_jobs[job_id] = df
+
+        # Starting the manager process blocks, so do it off the event loop
+        sync_manager = await asyncio.to_thread(self._get_sync_manager)
+        if job.status in FINISHED_STATUSES:
+            # Cancelled while the manager was starting, before it had an event
+            self.speculative_jobs.pop(job_id, None)
+            return job
+        progress_queue = sync_manager.Queue()
+        cancel_event = sync_manager.Event()
+        self.cancel_events[job_id] = cancel_event
+        if tune:
+            watcher = self._search(job, encoded, df[target_column], progress_queue)
+        else:
+            self.futures[job_id] = self._submit_work(
+                run_training_job,
+                encoded,
+                df[target_column],
+                progress_queue,
+                cancel_event,
+                engine,
+                time_budget,
+            )
+            watcher = self._watch(job, self.futures[job_id], progress_queue)
+        self.watchers[job_id] = asyncio.create_task(watcher)
+
+        await self.manager.send_log(
+            job_id, "info", f"Training job queued for '{target_column}'", 0
+        )
+        return job
+
+    def speculate(self, task_id: str, df: pl.DataFrame, target_columns: List[str]):
+        """Queue low-priority training of likely targets for a processed frame"""
+        queued = {(task, target) for task, _, target in self.speculation_queue}
+        running = {
+            (self.jobs[job_id].task_id, self.jobs[job_id].target_column)
+            for job_id in self.speculative_jobs
+        }
+        for target in target_columns:
+            key = (task_id, target)
+            if target not in df.columns or key in queued or key in running:
+                continue
+            if key in self.speculative_results:
+                continue
+            self.speculation_queue.append((task_id, df, target))
+        self._start_speculator()
+
+    def _start_speculator(self):
+        if self.speculation_queue and (
+            self._speculator is None or self._speculator.done()
+        ):
+            self._speculator = asyncio.create_task(self._run_speculation())
+
+    async def _run_speculation(self):
+        """Start queued speculative jobs one at a time while the pool is idle"""
+        while self.speculation_queue:
+            if self.get_requested_jobs() or self.speculative_jobs:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            task_id, df, target = self.speculation_queue.popleft()
+            try:
+                await self._submit(
+                    task_id, df, target, SPECULATIVE_ENGINE, None, False, speculative=True
+                )
+            except Exception as e:
+                self.logger.warning(
+                    f"Speculative training of '{target}' for {task_id} failed: {e}"
+                )
+
+    def _preempt_speculation(self):
+        """Cancel running speculative jobs and queue their targets again"""
+        for job_id, df in list(self.speculative_jobs.items()):
+            job = self.jobs[job_id]
+            self.cancel(job_id)
+            job.message = "Preempted by a requested training job"
+            self.speculation_queue.appendleft((job.task_id, df, job.target_column))
+        self._start_speculator()
+
+    async def _adopt_speculation(
+        self, task_id: str, df: pl.DataFrame, target_column: str
+    ) -> Optional[TrainingJob]:
+        """
+        Answer a request from speculation: a finished bundle is registered
+        at once, and a running job is handed over to the caller.
+        """
+        self.speculation_queue = deque(
+            entry
+            for entry in self.speculation_queue
+            if entry[0] != task_id or entry[2] != target_column
+        )
+
+        for job_id, source in list(self.speculative_jobs.items()):
+            job = self.jobs[job_id]
+            if job.status in FINISHED_STATUSES:
+                continue  # Preempted, waiting for its watcher to clean up
+            if job.task_id == task_id and job.target_column == target_column:
+                del self.speculative_jobs[job_id]
+                if source is not df:
+                    self.cancel(job_id)  # Trained on data that was replaced
+                    return None
+                # The watcher registers the model when it finishes
+                job.speculative = False
+                return job
+
+        source, model_data = self.speculative_results.pop(
+            (task_id, target_column), (None, None)
+        )
+        if model_data is None or source is not df:
+            return None
+        result = self.ml_processor.register_model(task_id, model_data)
+        await asyncio.to_thread(self.ml_processor.persist_model, task_id)
+        now = datetime.now().isoformat()
+        job = TrainingJob(
+            job_id=str(uuid.uuid4()),
+            task_id=task_id,
+            target_column=target_column,
+            engine=SPECULATIVE_ENGINE,
+            status="completed",
+            progress=100,
+            message="Used the pre-trained model",
+            result=TrainModelResponse(**result),
+            created_at=now,
+            finished_at=now,
+        )
+        self.jobs[job.job_id] = job
+        return job
+
+    def prune_finished(self, max_age: float) -> int:
+        """Forget jobs that finished more than max_age seconds ago"""
+        cutoff = datetime.now().timestamp() - max_age
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.status in FINISHED_STATUSES
+            and job_id not in self.watchers
+            and job.finished_at is not None
+            and datetime.fromisoformat(job.finished_at).timestamp() < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+            self.futures.pop(job_id, None)
+            self.cancel_events.pop(job_id, None)
+        return len(expired)
+
+    def discard_speculation(self, task_id: str):
+        """Drop a task's queued, running and finished speculative training"""
+        self.speculation_queue = deque(
+            entry for entry in self.speculation_queue if entry[0] != task_id
+        )
+        for job_id in list(self.speculative_jobs):
+            if self.jobs[job_id].task_id == task_id:
+                self.cancel(job_id)
+        for key in [key for key in self.speculative_results if key[0] == task_id]:
+            del self.speculative_results[key]
+
+    async def wait(self, job_id: str) -> TrainingJob:
+        """Wait for a job to finish without blocking the event loop"""
+        watcher = self.watchers.get(job_id)
+        if watcher is not None:
+            await asyncio.shield(watcher)
+        return self.jobs[job_id]
+
+    async def train(
+        self,
+        task_id: str,
+        df: pl.DataFrame,
+        target_column: str,
+        engine: str = "random_forest",
+        time_budget: Optional[float] = None,
+        tune: bool = False,
+    ) -> Dict[str, Any]:
+        """Submit a job and wait for it, returning a train_model style result"""
+        job = await self.submit(task_id, df, target_column, engine, time_budget, tune)
+        job = await self.wait(job.job_id)
+        if job.status == "completed":
+            return job.result.model_dump()
+        return {"success": False, "error": job.error or f"Training {job.status}"}
+
+    def get_job(self, job_id: str) -> Optional[TrainingJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return False
+
+        # Queued jobs never start; running ones stop at the next tree step
+        future = self.futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        elif job_id in self.watchers:
+            self.watchers[job_id].cancel()  # Still searching hyperparameters
+        cancel_event = self.cancel_events.get(job_id)
+        if cancel_event is not None:  # None until _submit has the manager
+            cancel_event.set()
+        self._finish(job, "cancelled", message="Training cancelled")
+        return True
+
+    async def _search(
+        self, job: TrainingJob, encoded: EncodedFrame, target: pl.Series, progress_queue
+    ):
+        """Run a hyperparameter search, then train the best candidate"""
+        job_id = job.job_id
+
+        async def report(message: str, percent: int):
+            job.status = "running"
+            job.progress = percent
+            job.message = message
+            await self.manager.send_log(job_id, "info", message, percent)
+
+        pool = self._get_pool()
+        try:
+            split = await asyncio.to_thread(
+                self.ml_processor.split_training_data, encoded, target
+            )
+            await report("Searching hyperparameters", 5)
+            with STAGE_LATENCY.time("train", "search"):
+                params, cv_score = await successive_halving(
+                    pool,
+                    encoded,
+                    split,
+                    job.engine,
+                    report,
+                    self.cancel_events[job_id].is_set,
+                )
+            await self.manager.send_log(
+                job_id,
+                "success",
+                f"Best candidate: {describe_params(params)} (CV score {cv_score:.4f})",
+                80,
+            )
+        except (asyncio.CancelledError, TrainingCancelled):
+            # Cancellation is handled here, so callers waiting on the job return
+            self._finish(job, "cancelled", message="Training cancelled")
+            await self.manager.send_log(
+                job_id, "error", "Training cancelled", job.progress, finished=True
+            )
+            self.cancel_events.pop(job_id, None)
+            self.watchers.pop(job_id, None)
+            return
+        except Exception as e:
+            if isinstance(e, BrokenExecutor):
+                self._reset_pool(pool)
+            self.logger.error(f"Hyperparameter search {job_id} failed: {e}")
+            self._finish(job, "failed", error=str(e))
+            await self.manager.send_log(
+                job_id, "error", f"Training failed: {e}", 0, finished=True
+            )
+            self.cancel_events.pop(job_id, None)
+            self.watchers.pop(job_id, None)
+            return
+
+        self.futures[job_id] = self._submit_work(
+            run_training_job,
+            encoded,
+            target,
+            progress_queue,
+            self.cancel_events[job_id],
+            job.engine,
+            None,  # Requests cannot combine a time budget with tuning
+            params,
+        )
+        await self._watch(
+            job, self.futures[job_id], progress_queue, extra_info={"cv_score": cv_score}
+        )
+
+    async def _watch(
+        self,
+        job: TrainingJob,
+        future: Future,
+        progress_queue,
+        extra_info: Optional[Dict[str, Any]] = None,
+    ):
+        """Relay worker progress over the WebSocket and register the result"""
+        job_id = job.job_id
+        try:
+            while not future.done():
+                await self._relay_progress(job, progress_queue)
+                await asyncio.sleep(POLL_INTERVAL)
+            await self._relay_progress(job, progress_queue)
+
+            if job.status == "cancelled":
+                await self.manager.send_log(
+                    job_id, "error", "Training cancelled", job.progress, finished=True
+                )
+                return
+
+            model_data = future.result()
+            model_data["model_info"].update(extra_info or {})
+            # Fitted in a worker process, so timed there and recorded here
+            STAGE_LATENCY.observe(
+                model_data["model_info"]["training_seconds"], "train", "fit"
+            )
+            if job.speculative:
+                # Kept aside until requested; registering would replace the
+                # task's current model
+                key = (job.task_id, job.target_column)
+                self.speculative_results[key] = (
+                    self.speculative_jobs[job_id],
+                    model_data,
+                )
+                result = MLProcessor.summarize(model_data)
+            else:
+                result = self.ml_processor.register_model(job.task_id, model_data)
+                await asyncio.to_thread(self.ml_processor.persist_model, job.task_id)
+            job.result = TrainModelResponse(**result)
+            self._finish(job, "completed", message="Training completed")
+            await self.manager.send_log(
+                job_id,
+                "success",
+                f"{result['score_name']}: {result['score']:.4f}",
+                100,
+                finished=True,
+            )
+
+        except (CancelledError, TrainingCancelled):
+            self._finish(job, "cancelled", message="Training cancelled")
+            await self.manager.send_log(
+                job_id, "error", "Training cancelled", job.progress, finished=True
+            )
+        except Exception as e:
+            self.logger.error(f"Training job {job_id} failed: {e}")
+            self._finish(job, "failed", error=str(e))
+            await self.manager.send_log(
+                job_id, "error", f"Training failed: {e}", 0, finished=True
+            )
+        finally:
+            self.futures.pop(job_id, None)
+            self.cancel_events.pop(job_id, None)
+            self.watchers.pop(job_id, None)
+            self.speculative_jobs.pop(job_id, None)
+
+    async def _relay_progress(self, job: TrainingJob, progress_queue):
+        while True:
+            try:
+                message, percent = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            if job.status == "cancelled":
+                continue
+            job.status = "running"
+            job.progress = percent
+            job.message = message
+            await self.manager.send_log(job.job_id, "info", message, percent)
+
+    @staticmethod
+    def _finish(
+        job: TrainingJob,
+        status: str,
+        message: Optional[str] = None,
+        error: Optional[str] = None,
+    ):
+        if job.status in FINISHED_STATUSES:
+            return
+        job.status = status
+        job.message = message
+        job.error = error
+        if status == "completed":
+            job.progress = 100
+        job.finished_at = datetime.now().isoformat()
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker processes"""
+        if self._speculator is not None:
+            self._speculator.cancel()
+        self.speculation_queue.clear()
+        for job_id in self.get_unfinished_jobs():
+            self.cancel(job_id)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._sync_manager is not None:
+            self._sync_manager.shutdown()
+            self._sync_manager = None
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+from sklearn.model_selection import (
+    KFold,
+    ParameterSampler,
+    StratifiedKFold,
+    cross_val_score,
+)
+from sklearn.preprocessing import LabelEncoder
+
+from .ml_pipeline import EncodedFrame, MLProcessor, TrainingCancelled, TrainingSplit
+
+# Hyperparameters explored per engine
+SEARCH_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    "random_forest": {
+        "max_depth": [None, 24, 12],
+        "min_samples_leaf": [1, 3, 8],
+        "max_features": ["sqrt", 0.5, 1.0],
+    },
+    "hist_gradient_boosting": {
+        "learning_rate": [0.05, 0.1, 0.2],
+        "max_leaf_nodes": [15, 31, 63],
+        "l2_regularization": [0.0, 1.0],
+    },
+}
+MAX_CANDIDATES = 9
+HALVING_FACTOR = 3
+CV_FOLDS = 3
+# Smallest number of rows a candidate is cross-validated on
+MIN_ROUND_ROWS = 500
+
+
+def evaluate_candidate(
+    matrix_path: str,
+    rows: np.ndarray,
+    features: np.ndarray,
+    y: np.ndarray,
+    engine: str,
+    is_classification: bool,
+    feature_encoders: Dict[str, LabelEncoder],
+    feature_columns: List[str],
+    params: Dict[str, Any],
+) -> float:
+    """Mean cross-validation score of one candidate, run in a worker process"""
+    # Memory-mapped, so workers share the page cache instead of copies
+    matrix = np.load(matrix_path, mmap_mode="r")
+    X = np.asfortranarray(matrix.T[np.ix_(features, rows)].T, dtype=np.float32)
+
+    model = MLProcessor._make_model(
+        engine, is_classification, feature_encoders, feature_columns
+    ).set_params(**params)
+    if is_classification:
+        folds = StratifiedKFold(CV_FOLDS, shuffle=True, random_state=42)
+        scoring = "accuracy"
+    else:
+        folds = KFold(CV_FOLDS, shuffle=True, random_state=42)
+        scoring = "r2"
+    return float(np.mean(cross_val_score(model, X, y, cv=folds, scoring=scoring)))
+
+
+def sample_candidates(engine: str) -> List[Dict[str, Any]]:
+    return list(
+        ParameterSampler(SEARCH_SPACES[engine], n_iter=MAX_CANDIDATES, random_state=42)
+    )
+
+
+async def successive_halving(
+    pool: Executor,
+    encoded: EncodedFrame,
+    split: TrainingSplit,
+    engine: str,
+    report: Callable[[str, int], Awaitable[None]],
+    should_stop: Callable[[], bool],
+) -> Tuple[Dict[str, Any], float]:
+    """
+    Find the best hyperparameters on the training rows. Every round
+    cross-validates the surviving candidates in parallel on the pool, then
+    keeps the best 1/HALVING_FACTOR and gives them HALVING_FACTOR times as
+    many rows. Evaluations share the pool with other training jobs, so the
+    pool size caps the CPU a search can take.
+
+    Returns the best parameters and their cross-validation score.
+    """
+    candidates = sample_candidates(engine)
+    sizes = [len(candidates)]
+    while sizes[-1] > 1:
+        sizes.append(max(sizes[-1] // HALVING_FACTOR, 1))
+    rounds = len(sizes) - 1
+    total_evaluations = sum(sizes[:-1])
+    n_train = len(split.train_rows)
+
+    handle, matrix_path = tempfile.mkstemp(suffix=".npy")
+    os.close(handle)
+    try:
+        await asyncio.to_thread(np.save, matrix_path, encoded.matrix)
+        rng = np.random.default_rng(42)
+        loop = asyncio.get_running_loop()
+        evaluated = 0
+        scores: List[float] = []
+
+        for round_index in range(rounds):
+            n_rows = max(
+                n_train // HALVING_FACTOR ** (rounds - 1 - round_index),
+                min(MIN_ROUND_ROWS, n_train),
+            )
+            keep = np.sort(rng.choice(n_train, n_rows, replace=False))
+            rows, y = split.train_rows[keep], split.y_train[keep]
+
+            futures = [
+                asyncio.wrap_future(
+                    pool.submit(
+                        evaluate_candidate,
+                        matrix_path,
+                        rows,
+                        split.features,
+                        y,
+                        engine,
+                        split.is_classification,
+                        split.feature_encoders,
+                        split.feature_columns,
+                        params,
+                    ),
+                    loop=loop,
+                )
+                for params in candidates
+            ]
+            scores = [0.0] * len(candidates)
+            try:
+                for future in asyncio.as_completed(
+                    [_indexed(i, future) for i, future in enumerate(futures)]
+                ):
+                    index, score = await future
+                    if should_stop():
+                        raise TrainingCancelled("Training was cancelled")
+                    scores[index] = score
+                    evaluated += 1
+                    await report(
+                        f"Round {round_index + 1}/{rounds}, {n_rows} rows: "
+                        f"{describe_params(candidates[index])} scored {score:.4f}",
+                        10 + int(70 * evaluated / total_evaluations),
+                    )
+            finally:
+                for future in futures:
+                    future.cancel()
+
+            ranking = np.argsort(scores)[::-1][: sizes[round_index + 1]]
+            candidates = [candidates[i] for i in ranking]
+            scores = [scores[i] for i in ranking]
+
+        return candidates[0], scores[0]
+    finally:
+        os.remove(matrix_path)
+
+
+async def _indexed(index: int, future: Awaitable[float]) -> Tuple[int, float]:
+    return index, await future
+
+
+def describe_params(params: Dict[str, Any]) -> str:
+    return ", ".join(f"{name}={value}" for name, value in sorted(params.items()))
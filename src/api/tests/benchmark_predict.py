@@ -0,0 +1,75 @@
+"""
+Latency of sklearn vs the compiled forest for single rows and small batches.
+
+Run from the repository root:
+    python -m src.api.tests.benchmark_predict
+"""
+
+import pickle
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from src.api.routes.compiled_forest import CompiledForest
+
+N_ROWS = 20_000
+N_FEATURES = 10
+REPEATS = 300
+BATCH_SIZES = (1, 8, 32)
+
+
+def make_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(N_ROWS, N_FEATURES)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    signal = np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1])
+    y_class = (signal > 0).astype(int) + (np.nan_to_num(X[:, 2]) > 1)
+    y_reg = 3 * signal + rng.normal(size=N_ROWS)
+    return X, y_class, y_reg
+
+
+def time_calls(predict, X, batch_size):
+    timings = []
+    for i in range(REPEATS):
+        batch = X[i : i + batch_size]
+        start = time.perf_counter()
+        predict(batch)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def main():
+    X, y_class, y_reg = make_data()
+    split = int(N_ROWS * 0.8)
+
+    for model, y in (
+        (RandomForestClassifier(n_estimators=100, random_state=42), y_class),
+        (RandomForestRegressor(n_estimators=100, random_state=42), y_reg),
+    ):
+        model.fit(X[:split], y[:split])
+        compiled = CompiledForest(model)
+        X_test = X[split:]
+
+        if compiled.is_classifier:
+            sklearn_predict, compiled_predict = model.predict_proba, compiled.predict_proba
+        else:
+            sklearn_predict, compiled_predict = model.predict, compiled.predict
+        identical = np.array_equal(sklearn_predict(X_test), compiled_predict(X_test))
+
+        print(f"{type(model).__name__}: identical outputs = {identical}")
+        print(
+            f"  size: sklearn {len(pickle.dumps(model)) / 1e6:.1f} MB, "
+            f"compiled {compiled.nbytes / 1e6:.1f} MB"
+        )
+        for batch_size in BATCH_SIZES:
+            sk_p50, sk_p99 = time_calls(sklearn_predict, X_test, batch_size)
+            c_p50, c_p99 = time_calls(compiled_predict, X_test, batch_size)
+            print(
+                f"  {batch_size:>3} rows: sklearn p50 {sk_p50:.2f} ms p99 {sk_p99:.2f} ms"
+                f" | compiled p50 {c_p50:.2f} ms p99 {c_p99:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
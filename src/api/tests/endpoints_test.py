@@ -1,11 +1,40 @@
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from fastapi.testclient import TestClient
+import asyncio
+import gzip
 import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
 import polars as pl
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 
 # Import your app (adjust the import path as needed)
 from src.api.main import app  # Replace with actual import path
+import src.api.main as main_module
+from src.api.connection_manager import ConnectionManager
+from src.api.models import ProcessingResult, TrainingJob
+from src.api.routes.charts import MAX_CACHED_RESULTS, ChartDataProcessor
+from src.api.routes.compiled_forest import CompiledForest
+from src.api.routes.ingestion_pipeline import CSVProcessor
+from src.api.routes.memory_governor import MemoryGovernor, estimate_parsed_size
+import src.api.routes.ml_pipeline as ml_pipeline
+from src.api.routes.ml_pipeline import (
+    BOOSTING_STEPS,
+    PILOT_ROWS,
+    TREES_PER_STEP,
+    UNSEEN_CATEGORY,
+    MLProcessor,
+)
+from src.api.routes.prediction_batcher import PredictionBatcher
+from src.api.routes.query import parse_filter
+from src.api.routes.rows import MAX_SORT_ORDERS, RowBrowser
+from src.api.routes.training_jobs import TrainingCapacityError, TrainingJobManager
 
 @pytest.fixture
 def client():
@@ -13,6 +42,18 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture
+def model_store(tmp_path, monkeypatch):
+    """Persist the app's models to a temporary directory and forget them afterwards"""
+    processor = main_module.ml_processor
+    monkeypatch.setattr(processor, "model_dir", str(tmp_path))
+    existing = set(processor.model_info)
+    yield processor
+    processor.model_dir = None  # Restored by monkeypatch; release now forgets
+    for task_id in set(processor.model_info) - existing:
+        processor.release(task_id)
+
+
 class TestBasicEndpoints:
     def test_root_endpoint(self, client):
         response = client.get("/")
@@ -29,6 +70,33 @@ class TestBasicEndpoints:
         assert "timestamp" in data
         assert "active_tasks" in data
 
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_metrics_endpoint(self, mock_get_data, client):
+        mock_get_data.return_value = pl.DataFrame({"a": [1, 2, None], "b": ["x", "y", "x"]})
+        client.get("/profile/metrics-task")
+        client.get("/profile/metrics-task")
+        df = pl.DataFrame({"a": list(range(10))})
+        with patch.dict("src.api.main.csv_processor.processed_data", {"metrics-task": df}):
+            response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+
+        # Requests are labelled by route template, not by task ID
+        profile = 'method="GET",route="/profile/{task_id}",status="200"'
+        count = next(
+            line for line in body.splitlines()
+            if line.startswith(f"http_request_duration_seconds_count{{{profile}}}")
+        )
+        assert int(count.split()[-1]) >= 2
+        assert f'http_request_duration_seconds_bucket{{{profile},le="+Inf"}}' in body
+        assert 'pipeline_stage_duration_seconds_count{pipeline="profile",stage="correlations"}' in body
+        assert '# TYPE prediction_queue_depth gauge' in body
+        assert (
+            f'task_memory_bytes{{task_id="metrics-task",kind="data"}} {df.estimated_size()}'
+            in body
+        )
+
     def test_debug_endpoint(self, client):
         task_id = "test-task-123"
         response = client.get(f"/debug/{task_id}")
@@ -94,6 +162,84 @@ class TestDataEndpoints:
             assert "columns" in data
             assert "shape" in data
             assert data["columns"] == ["name", "age", "city"]
+            assert data["memory_usage"]["total_bytes"] == mock_df.estimated_size()
+            assert set(data["memory_usage"]["per_column"]) == {"name", "age", "city"}
+
+    def test_memory_report(self, client):
+        df = pl.DataFrame({"a": list(range(100)), "b": ["x"] * 100})
+        with patch.dict("src.api.main.csv_processor.processed_data", {"mem-task": df}):
+            response = client.get("/memory")
+            assert response.status_code == 200
+            data = response.json()
+            assert data["tasks"]["mem-task"]["total_bytes"] == df.estimated_size()
+            assert data["total_bytes"] >= df.estimated_size()
+
+    def test_memory_governor_evicts_lru_and_refuses_uploads(self, client):
+        connections = ConnectionManager()
+        csv_processor = CSVProcessor(connections)
+        ml_processor = MLProcessor()
+        jobs = TrainingJobManager(ml_processor, connections)
+        chart_cache = Mock(memory_usage=Mock(return_value={}))
+        row_browser = RowBrowser()
+        frame = pl.DataFrame({"a": np.arange(100_000, dtype=np.float64)})
+        governor = MemoryGovernor(
+            csv_processor,
+            ml_processor,
+            jobs,
+            connections,
+            caches=[chart_cache, row_browser],
+            budget_bytes=int(frame.estimated_size() * 3),
+        )
+        for task_id in ("old", "new", "ingesting"):
+            csv_processor.processed_data[task_id] = frame
+            csv_processor.last_used[task_id] = time.monotonic()
+        csv_processor.active_tasks["ingesting"] = Mock()
+        csv_processor.get_processed_data("old")  # Now the most recently used
+
+        # Cached sort orders count toward their task
+        row_browser.page("old", frame, 10, sort="-a")
+        index_bytes = row_browser.memory_usage()["old"]
+        assert governor.task_usage()["old"]["cache_bytes"] == index_bytes > 0
+        assert governor.report()["used_bytes"] == 3 * frame.estimated_size() + index_bytes
+        assert governor.enforce() == ["new"]
+        chart_cache.invalidate.assert_called_once_with("new")
+        assert set(csv_processor.processed_data) == {"old", "ingesting"}
+
+        # Appending to a task never evicts it to make room
+        assert not governor.admit(frame.estimated_size() * 2, keep=("old",))
+        assert set(csv_processor.processed_data) == {"old", "ingesting"}
+
+        # Room is made by evicting idle tasks; tasks being ingested stay
+        assert governor.admit(frame.estimated_size())
+        assert set(csv_processor.processed_data) == {"ingesting"}
+        assert row_browser.sort_indices == {}
+        assert not governor.admit(frame.estimated_size() * 3)
+        assert governor.report()["refused_uploads"] == 2
+
+        df = pl.DataFrame({"size": [1.0, 2.0, 10.0, 11.0] * 10, "label": ["s", "s", "b", "b"] * 10})
+        assert ml_processor.train_model("model-task", df, "label")["success"]
+        assert governor.task_usage()["model-task"]["model_bytes"] > 0
+        hour_ago = datetime.fromtimestamp(time.time() - 3600).isoformat()
+        jobs.jobs["old-job"] = TrainingJob(
+            job_id="old-job",
+            task_id="model-task",
+            target_column="label",
+            status="completed",
+            created_at=hour_ago,
+            finished_at=hour_ago,
+        )
+        governor.ttl_seconds = 0
+        assert "model-task" in governor.enforce()
+        assert "model-task" not in ml_processor.models
+        assert jobs.jobs == {}  # Finished jobs are forgotten after the TTL
+
+        assert "memory" in client.get("/health").json()
+
+    def test_estimate_parsed_size(self):
+        csv = "x,label\n" + "".join(f"{i * 0.5},{'abc'[i % 3]}\n" for i in range(100_000))
+        estimate = estimate_parsed_size(csv.encode())
+        actual = pl.read_csv(io.BytesIO(csv.encode())).estimated_size()
+        assert 0.8 * actual < estimate < 1.25 * actual
 
     @patch("src.api.main.csv_processor.get_processed_data")
     def test_get_processed_data_info_not_found(self, mock_get_data, client):
@@ -130,6 +276,143 @@ class TestChartDataEndpoint:
         assert len(data["data"]) == 3
         assert data["data"][0] == {"x": 1, "y": 10}
 
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_histogram_bins_full_column(self, mock_get_data, client):
+        mock_df = pl.DataFrame({"x_col": list(range(1000))})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/chart-data/hist-task?x_axis=x_col&chart_type=histogram&bins=10&limit=50")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["returned_rows"] == 10
+        assert sum(data["bins"]["counts"]) == 1000
+        assert len(data["bins"]["edges"]) == 11
+        assert data["bins"]["quantiles"]["0.5"] == 499.5
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_histogram_counts_text_categories(self, mock_get_data, client):
+        mock_df = pl.DataFrame({"x_col": ["b", "a", "b", None, "c", "b", "a"]})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/chart-data/hist-text-task?x_axis=x_col&chart_type=histogram")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["data"] == [
+            {"x": "b", "y": 3},
+            {"x": "a", "y": 2},
+            {"x": "c", "y": 1},
+        ]
+        assert data["bins"]["bin_method"] == "categorical"
+        assert data["bins"]["count"] == 6
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_line_downsamples_full_column(self, mock_get_data, client):
+        values = [float(i % 50) for i in range(5000)]
+        values[4321] = 1000.0
+        mock_df = pl.DataFrame({"x_col": list(range(5000)), "y_col": values})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/chart-data/line-task?x_axis=x_col&y_axis=y_col&chart_type=line&limit=100")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert len(data) == 100
+        assert data[0]["x"] == 0 and data[-1]["x"] == 4999
+        assert {"x": 4321, "y": 1000.0} in data
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_scatter_respects_point_budget(self, mock_get_data, client):
+        mock_df = pl.DataFrame({"x_col": list(range(5000)), "y_col": list(range(5000, 0, -1))})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/chart-data/scatter-task?x_axis=x_col&y_axis=y_col&limit=100")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert 0 < len(data) <= 100
+        assert sum(point["count"] for point in data) == 5000
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_pie_top_n_with_other(self, mock_get_data, client):
+        cities = ["A"] * 500 + ["B"] * 300 + ["C"] * 150 + ["D"] * 40 + ["E"] * 10
+        mock_df = pl.DataFrame({"city": cities, "income": [1] * 1000})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/chart-data/pie-task?x_axis=city&chart_type=pie&top_n=2")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["data"] == [
+            {"name": "A", "value": 500},
+            {"name": "B", "value": 300},
+            {"name": "Other", "value": 200},
+        ]
+        assert data["other_categories"] == 3
+
+        response = client.get("/chart-data/pie-task?x_axis=city&y_axis=income&chart_type=bar&agg=sum&top_n=3")
+        assert response.status_code == 200
+        bars = response.json()["data"]
+        assert bars[-1] == {"x": "Other", "y": 50, "count": 50}
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_columnar_and_arrow_formats(self, mock_get_data, client):
+        mock_df = pl.DataFrame({"x_col": [1, 2, 3], "y_col": [10, 20, 30]})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/chart-data/fmt-task?x_axis=x_col&y_axis=y_col&format=columnar")
+        assert response.status_code == 200
+        assert response.json()["data"] == {"x": [1, 2, 3], "y": [10, 20, 30]}
+
+        response = client.get("/chart-data/fmt-task?x_axis=x_col&y_axis=y_col&format=arrow")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        frame = pl.read_ipc_stream(io.BytesIO(response.content))
+        assert frame.to_dict(as_series=False) == {"x": [1, 2, 3], "y": [10, 20, 30]}
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_chart_data_where_filter_and_aggregate(self, mock_get_data, client):
+        mock_df = pl.DataFrame(
+            {
+                "age": [20, 20, 30, 30, 40],
+                "income": [100, 300, 500, 700, 900],
+                "city": ["X", "X", "X", "Y", "X"],
+            }
+        )
+        mock_get_data.return_value = mock_df
+
+        response = client.get(
+            "/chart-data/query-task",
+            params={"x_axis": "age", "y_axis": "income", "where": "city == 'X' and age < 40"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["query_rows"] == 3
+        assert data["data"] == [{"x": 20, "y": 100}, {"x": 20, "y": 300}, {"x": 30, "y": 500}]
+
+        response = client.get(
+            "/chart-data/query-task",
+            params={"x_axis": "age", "y_axis": "income", "chart_type": "line", "agg": "mean", "where": "city in ('X')"},
+        )
+        assert response.json()["data"] == [{"x": 20, "y": 200.0}, {"x": 30, "y": 500.0}, {"x": 40, "y": 900.0}]
+
+        response = client.get(
+            "/chart-data/query-task",
+            params={"x_axis": "age", "y_axis": "income", "where": "town == 'X'"},
+        )
+        assert response.status_code == 400
+
+    def test_chart_cache_is_bounded_per_task(self):
+        processor = ChartDataProcessor()
+        df = pl.DataFrame({"age": list(range(200)), "income": list(range(200))})
+        for bound in range(MAX_CACHED_RESULTS * 2):
+            scope, view = processor.query_frame(
+                "lru-task", df, "age", "income", parse_filter(f"age < {bound}")
+            )
+            processor.histogram(scope, view, "age")
+        task_cache = processor.cache["lru-task"]
+        assert len(task_cache) == MAX_CACHED_RESULTS
+        assert processor.memory_usage()["lru-task"] >= view.estimated_size()
+        # The newest query and the chart built on it are kept
+        assert (scope, ("histogram", "age", None)) in task_cache
+        assert processor.histogram(scope, view, "age")["counts"]
+
     @patch("src.api.main.csv_processor.get_processed_data")
     def test_get_chart_data_invalid_column(self, mock_get_data, client):
         mock_df = pl.DataFrame({"valid_col": [1, 2, 3]})
@@ -146,6 +429,145 @@ class TestChartDataEndpoint:
         assert response.status_code == 404
 
 
+class TestRowsEndpoint:
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_rows_cursor_pagination_ndjson(self, mock_get_data, client):
+        mock_df = pl.DataFrame({"a": list(range(25)), "b": [f"r{i}" for i in range(25)]})
+        mock_get_data.return_value = mock_df
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 10, "columns": "a", "sort": "-a"}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/rows/rows-task", params=params)
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/x-ndjson"
+            rows = [json.loads(line) for line in response.text.splitlines()]
+            seen.extend(row["a"] for row in rows)
+            cursor = response.headers["x-next-cursor"]
+            if not cursor:
+                break
+
+        assert seen == list(range(24, -1, -1))
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_rows_arrow_format_and_invalid_cursor(self, mock_get_data, client):
+        mock_df = pl.DataFrame({"a": list(range(25))})
+        mock_get_data.return_value = mock_df
+
+        response = client.get("/rows/rows-task", params={"limit": 5, "format": "arrow"})
+        assert response.status_code == 200
+        frame = pl.read_ipc_stream(io.BytesIO(response.content))
+        assert frame["a"].to_list() == [0, 1, 2, 3, 4]
+
+        response = client.get("/rows/rows-task", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_rows_arrow_stream_round_trips_batches(self):
+        page = pl.DataFrame(
+            {"a": list(range(2500)), "s": [f"x{i % 7}" if i % 5 else None for i in range(2500)]}
+        ).with_columns(c=pl.col("s").cast(pl.Categorical))
+        stream = b"".join(RowBrowser.stream(page, "arrow", batch_size=1000))
+        assert pl.read_ipc_stream(io.BytesIO(stream)).equals(page)
+        empty = b"".join(RowBrowser.stream(page.head(0), "arrow"))
+        assert pl.read_ipc_stream(io.BytesIO(empty)).schema == page.schema
+
+    def test_rows_sort_orders_are_capped(self):
+        browser = RowBrowser()
+        df = pl.DataFrame({f"c{i}": list(range(10)) for i in range(MAX_SORT_ORDERS + 2)})
+        for column in df.columns:
+            browser.page("sort-task", df, 5, sort=f"-{column}")
+        assert len(browser.sort_indices["sort-task"]) == MAX_SORT_ORDERS
+        assert list(browser.sort_indices["sort-task"])[-1] == ((df.columns[-1], True),)
+
+
+class TestExportEndpoint:
+    @pytest.mark.parametrize(
+        "export_format, compression, reader",
+        [
+            ("parquet", None, pl.read_parquet),
+            ("arrow", "lz4", pl.read_ipc),
+            ("csv", None, pl.read_csv),
+            ("csv", "gzip", lambda buf: pl.read_csv(io.BytesIO(gzip.decompress(buf.read())))),
+        ],
+    )
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_export_round_trip(self, mock_get_data, export_format, compression, reader, client):
+        mock_df = pl.DataFrame({"a": list(range(120_000)), "b": ["x", "y", "z"] * 40_000})
+        mock_get_data.return_value = mock_df
+
+        params = {"format": export_format}
+        if compression:
+            params["compression"] = compression
+        response = client.get("/export/export-task", params=params)
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        assert reader(io.BytesIO(response.content)).equals(mock_df)
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_export_invalid_compression(self, mock_get_data, client):
+        mock_get_data.return_value = pl.DataFrame({"a": [1]})
+        response = client.get("/export/export-task", params={"format": "csv", "compression": "zstd"})
+        assert response.status_code == 400
+
+
+class TestResponseEncoding:
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_large_json_is_gzip_compressed(self, mock_get_data, client):
+        mock_get_data.return_value = pl.DataFrame({"x_col": list(range(2000)), "y_col": list(range(2000))})
+
+        response = client.get(
+            "/chart-data/enc-task?x_axis=x_col&y_axis=y_col&limit=2000&format=columnar",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["data"]["x"][-1] == 1999
+
+    def test_small_json_is_not_compressed(self, client):
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_zstd_preferred_over_gzip(self, mock_get_data, client):
+        mock_get_data.return_value = pl.DataFrame({"x_col": list(range(2000)), "y_col": list(range(2000))})
+
+        response = client.get(
+            "/chart-data/enc-task?x_axis=x_col&y_axis=y_col&limit=2000",
+            headers={"Accept-Encoding": "gzip, zstd"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "zstd"
+        assert response.json()["total_rows"] == 2000
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_zstd_streamed_response(self, mock_get_data, client):
+        mock_get_data.return_value = pl.DataFrame({"a": list(range(5000))})
+
+        response = client.get(
+            "/rows/zstd-task",
+            params={"limit": 5000},
+            headers={"Accept-Encoding": "zstd"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "zstd"
+        assert len(response.text.splitlines()) == 5000
+
+    @patch("src.api.main.ml_processor.predict")
+    def test_predict_serializes_numpy_values(self, mock_predict, client):
+        mock_predict.return_value = {
+            "success": True,
+            "prediction": np.int64(3),
+            "prediction_proba": {"a": np.float32(0.25), "b": np.float64(0.75)},
+        }
+        response = client.post("/predict", json={"task_id": "test-task", "input_data": {}})
+        assert response.status_code == 200
+        assert response.json()["prediction"] == 3
+        assert response.json()["prediction_proba"] == {"a": 0.25, "b": 0.75}
+
+
 class TestProfileEndpoint:
     @patch("src.api.main.csv_processor.get_processed_data")
     @patch("src.api.main.DataProfiler")
@@ -164,6 +586,19 @@ class TestProfileEndpoint:
         assert data["success"] is True
         assert "profile" in data
 
+    @patch("src.api.main.csv_processor.get_processed_data")
+    def test_get_data_profile_parallel_matches_serial(self, mock_get_data, client):
+        mock_df = pl.DataFrame(
+            {f"col{i}": [i, i + 1, None, i * 2] for i in range(12)}
+            | {"label": ["a", "b", "a", None]}
+        )
+        mock_get_data.return_value = mock_df
+
+        serial = client.get("/profile/test-task").json()["profile"]
+        parallel = client.get("/profile/test-task?parallel=true&max_workers=4").json()["profile"]
+        assert parallel["column_analysis"] == serial["column_analysis"]
+        assert list(parallel["column_analysis"]) == mock_df.columns
+
     @patch("src.api.main.csv_processor.get_processed_data")
     def test_get_data_profile_no_data(self, mock_get_data, client):
         mock_get_data.return_value = None
@@ -173,7 +608,7 @@ class TestProfileEndpoint:
 
 class TestMLEndpoints:
     @patch("src.api.main.csv_processor.get_processed_data")
-    @patch("src.api.main.ml_processor.train_model")
+    @patch("src.api.main.training_jobs.train", new_callable=AsyncMock)
     def test_train_model_success(self, mock_train, mock_get_data, client):
         mock_df = pl.DataFrame({"feature": [1, 2, 3], "target": [10, 20, 30]})
         mock_get_data.return_value = mock_df
@@ -189,6 +624,165 @@ class TestMLEndpoints:
         data = response.json()
         assert data["success"] is True
 
+    def test_training_job_runs_in_background(self, model_store):
+        mock_df = pl.DataFrame(
+            {"feature": list(range(40)), "label": ["a", "b"] * 20}
+        )
+        with TestClient(app) as client, patch(
+            "src.api.main.csv_processor.get_processed_data", return_value=mock_df
+        ):
+            response = client.post("/train/jobs", json={"task_id": "job-task", "target_column": "label"})
+            assert response.status_code == 200
+            job = response.json()
+            assert job["status"] == "queued"
+
+            for _ in range(300):
+                job = client.get(f"/train/jobs/{job['job_id']}").json()
+                if job["status"] in ("completed", "failed", "cancelled"):
+                    break
+                time.sleep(0.1)
+
+            assert job["status"] == "completed"
+            assert job["result"]["score_name"] == "Accuracy"
+            assert client.get("/model-info/job-task").status_code == 200
+
+    def test_tuned_training_job_registers_best_candidate(self, model_store):
+        rng = np.random.default_rng(0)
+        x = rng.normal(size=600)
+        mock_df = pl.DataFrame(
+            {"x": x, "noise": rng.normal(size=600), "label": np.where(x > 0, "a", "b")}
+        )
+        with TestClient(app) as client, patch(
+            "src.api.main.csv_processor.get_processed_data", return_value=mock_df
+        ):
+            job = client.post(
+                "/train/jobs",
+                json={"task_id": "tune-task", "target_column": "label", "tune": True},
+            ).json()
+            assert job["tune"] is True
+            response = client.post(
+                "/train/jobs",
+                json={"task_id": "tune-task", "target_column": "label", "tune": True, "time_budget": 5},
+            )
+            assert response.status_code == 422
+
+            for _ in range(600):
+                job = client.get(f"/train/jobs/{job['job_id']}").json()
+                if job["status"] in ("completed", "failed", "cancelled"):
+                    break
+                time.sleep(0.1)
+
+            assert job["status"] == "completed", job.get("error")
+            # Search progress and the final log share the job's socket
+            logs = [
+                json.loads(message)
+                for message in main_module.connection_manager.message_queues[job["job_id"]]
+            ]
+            assert any(log["message"].startswith("Round 1/") for log in logs)
+            assert logs[-1]["finished"] is True
+            assert "tune-task" not in main_module.connection_manager.message_queues
+            result = job["result"]
+            assert set(result["params"]) == {"max_depth", "min_samples_leaf", "max_features"}
+            assert 0.5 < result["cv_score"] <= 1.0
+            assert result["score"] > 0.8
+
+    def test_speculative_training_answers_train_request(self):
+        df = pl.DataFrame(
+            {"feature": list(range(60)), "label": ["a", "b", "c"] * 20}
+        )
+        connections = Mock(send_log=AsyncMock())
+        manager = TrainingJobManager(MLProcessor(), connections, max_concurrent=2)
+
+        async def scenario():
+            manager.speculate("spec-task", df, ["label", "missing"])
+            assert [target for _, _, target in manager.speculation_queue] == ["label"]
+            for _ in range(300):
+                if ("spec-task", "label") in manager.speculative_results:
+                    break
+                await asyncio.sleep(0.1)
+            # Kept aside until requested, so the task has no model yet
+            assert "spec-task" not in manager.ml_processor.models
+
+            job = await manager.submit("spec-task", df, "label")
+            assert job.status == "completed"
+            assert job.message == "Used the pre-trained model"
+            assert "spec-task" in manager.ml_processor.models
+            # Other engines are trained as requested
+            other = await manager.submit(
+                "spec-task", df, "label", engine="hist_gradient_boosting"
+            )
+            return job, await manager.wait(other.job_id)
+
+        try:
+            job, other = asyncio.run(scenario())
+        finally:
+            manager.shutdown()
+        assert job.result.score_name == "Accuracy"
+        assert other.status == "completed" and not other.speculative
+
+    @patch("src.api.main.csv_processor.get_processed_data")
+    @patch("src.api.main.training_jobs.train", new_callable=AsyncMock)
+    def test_train_model_error_statuses(self, mock_train, mock_get_data, client):
+        mock_get_data.return_value = None
+        response = client.post("/train", json={"task_id": "missing-task", "target_column": "target"})
+        assert response.status_code == 404
+
+        mock_get_data.return_value = pl.DataFrame({"feature": [1, 2], "target": [1, 2]})
+        mock_train.side_effect = TrainingCapacityError("Too many training jobs in progress")
+        response = client.post("/train", json={"task_id": "busy-task", "target_column": "target"})
+        assert response.status_code == 429
+
+        mock_train.side_effect = ValueError("Target column 'other' not found in data")
+        response = client.post("/train", json={"task_id": "busy-task", "target_column": "other"})
+        assert response.status_code == 400
+
+        # Other failures are not reported as a full queue
+        mock_train.side_effect = RuntimeError("Unexpected failure")
+        response = client.post("/train", json={"task_id": "busy-task", "target_column": "target"})
+        assert response.status_code == 500
+
+    def test_training_recovers_from_dead_worker(self):
+        df = pl.DataFrame({"feature": list(range(40)), "label": ["a", "b"] * 20})
+        manager = TrainingJobManager(MLProcessor(), Mock(send_log=AsyncMock()))
+
+        async def scenario():
+            # A worker that exits abruptly breaks the pool for every later submit
+            broken = manager._get_pool().submit(os._exit, 1)
+            with pytest.raises(BrokenExecutor):
+                await asyncio.wrap_future(broken)
+            return await manager.train("dead-worker-task", df, "label")
+
+        try:
+            result = asyncio.run(scenario())
+        finally:
+            manager.shutdown()
+        assert result["success"]
+
+    def test_cancel_while_job_starts(self):
+        df = pl.DataFrame({"feature": list(range(40)), "label": ["a", "b"] * 20})
+        manager = TrainingJobManager(MLProcessor(), Mock(send_log=AsyncMock()))
+
+        def slow_sync_manager():
+            time.sleep(0.3)
+            return Mock()
+
+        async def scenario():
+            with patch.object(manager, "_get_sync_manager", slow_sync_manager):
+                submit = asyncio.create_task(manager.submit("race-task", df, "label"))
+                while not manager.jobs:
+                    await asyncio.sleep(0.01)
+                # The job exists before its cancel event does
+                assert manager.cancel(next(iter(manager.jobs)))
+                return await submit
+
+        job = asyncio.run(scenario())
+        assert job.status == "cancelled"
+        assert job.job_id not in manager.futures
+
+    def test_cancel_unknown_training_job(self, client):
+        response = client.delete("/train/jobs/unknown-job")
+        assert response.status_code == 404
+
     @patch("src.api.main.ml_processor.predict")
     def test_predict_success(self, mock_predict, client):
         mock_predict.return_value = {"success": True, "predictions": [25.5]}
@@ -198,6 +792,397 @@ class TestMLEndpoints:
         data = response.json()
         assert data["success"] is True
 
+    def test_predict_batch_json_and_csv(self, client, model_store):
+        train_df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 3.0, 10.0, 11.0, 12.0] * 10,
+                "color": ["red", "red", "blue", "green", "green", "blue"] * 10,
+                "label": ["small", "small", "small", "big", "big", "big"] * 10,
+            }
+        )
+        assert model_store.train_model("batch-task", train_df, "label")["success"]
+
+        rows = [{"size": 1.5, "color": "red"}, {"size": 11.5, "color": "green"}]
+        response = client.post("/predict/batch", json={"task_id": "batch-task", "rows": rows})
+        assert response.status_code == 200
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["prediction"] for r in results] == ["small", "big"]
+        single = client.post("/predict", json={"task_id": "batch-task", "input_data": rows[1]}).json()
+        assert results[1]["prediction_proba"] == single["prediction_proba"]
+
+        csv_file = io.BytesIO(b"size,color\n1.5,red\n11.5,purple\n")
+        response = client.post(
+            "/predict/batch",
+            data={"task_id": "batch-task"},
+            files={"file": ("rows.csv", csv_file, "text/csv")},
+        )
+        assert response.status_code == 200
+        assert len(response.text.splitlines()) == 2
+
+        response = client.post("/predict/batch", json={"task_id": "batch-task", "rows": [{"size": 1}]})
+        assert response.status_code == 400
+
+        # A value that cannot be cast fails the request before streaming
+        bad_rows = [{"size": 1.0, "color": "red"}, {"size": "abc", "color": "red"}]
+        response = client.post("/predict/batch", json={"task_id": "batch-task", "rows": bad_rows})
+        assert response.status_code == 400
+        assert "Invalid input values" in response.json()["detail"]
+
+    def test_encode_frame_builds_float32_matrix(self):
+        df = pl.DataFrame(
+            {
+                "size": [1.5, None, 3.0, 4.0],
+                "color": ["red", None, "blue", "red"],
+                "label": ["b", "a", "b", "c"],
+            }
+        )
+        encoded = main_module.ml_processor.encode_frame(df)
+        X = encoded.matrix
+
+        assert X.dtype == np.float32 and X.flags["F_CONTIGUOUS"]
+        assert encoded.feature_indices("label").tolist() == [0, 1]
+        assert np.isnan(X[1, 0])
+        assert list(encoded.encoders["color"].classes_) == ["blue", "missing", "red"]
+        assert X[:, 1].tolist() == [2, 1, 0, 2]
+        assert X[:, 2].tolist() == [1, 0, 1, 2]
+        assert list(encoded.encoders["label"].classes_) == ["a", "b", "c"]
+
+    def test_encoded_matrix_reused_across_targets(self):
+        processor = MLProcessor()
+        df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 3.0, 10.0, 11.0, 12.0] * 10,
+                "color": ["red", "red", "blue", "green", "green", "blue"] * 10,
+                "label": ["small", "small", "small", "big", "big", "big"] * 10,
+            }
+        )
+        with patch.object(processor, "encode_frame", wraps=processor.encode_frame) as encode:
+            assert processor.train_model("memo-task", df, "label")["success"]
+            assert processor.train_model("memo-task", df, "color")["success"]
+            assert encode.call_count == 1
+
+            assert processor.train_model("memo-task", df.clone(), "label")["success"]
+            assert encode.call_count == 2
+
+        assert processor.feature_columns["memo-task"] == ["size", "color"]
+        encoded = processor.get_encoded("memo-task", df)
+        assert encoded.matrix.flags["F_CONTIGUOUS"]
+        assert encoded.matrix[:4, 2].tolist() == [1, 1, 1, 0]
+
+    def test_compiled_forest_matches_sklearn(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(400, 4)).astype(np.float32)
+        X[rng.random(X.shape) < 0.1] = np.nan
+        signal = np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1])
+
+        classifier = RandomForestClassifier(n_estimators=20, random_state=0)
+        classifier.fit(X[:300], (signal[:300] > 0).astype(int))
+        compiled = CompiledForest(classifier)
+        assert np.array_equal(compiled.predict_proba(X[300:]), classifier.predict_proba(X[300:]))
+        assert np.array_equal(compiled.predict(X[300:]), classifier.predict(X[300:]))
+
+        regressor = RandomForestRegressor(n_estimators=20, random_state=0)
+        regressor.fit(X[:300], signal[:300])
+        assert np.array_equal(CompiledForest(regressor).predict(X[300:]), regressor.predict(X[300:]))
+
+    def test_forest_compiled_on_first_small_batch(self):
+        processor = MLProcessor()
+        df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 3.0, 10.0, 11.0, 12.0] * 10,
+                "label": ["small", "small", "small", "big", "big", "big"] * 10,
+            }
+        )
+        assert processor.train_model("lazy-task", df, "label")["success"]
+        model_bytes = processor.model_nbytes(processor.models["lazy-task"])
+        # Large batches use sklearn, so only one representation is held
+        processor.predict_frame("lazy-task", df.drop("label"))
+        assert "lazy-task" not in processor.compiled_models
+        assert processor.model_sizes["lazy-task"] == model_bytes
+
+        assert processor.predict("lazy-task", {"size": 2.0})["prediction"] == "small"
+        compiled = processor.compiled_models["lazy-task"]
+        assert processor.model_sizes["lazy-task"] == model_bytes + compiled.nbytes
+
+    def test_concurrent_predictions_are_batched(self):
+        processor = MLProcessor()
+        df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 3.0, 10.0, 11.0, 12.0] * 10,
+                "label": ["small", "small", "small", "big", "big", "big"] * 10,
+            }
+        )
+        assert processor.train_model("batched-task", df, "label")["success"]
+        batcher = PredictionBatcher(processor, window_ms=50, max_batch_size=8)
+        rows = [{"size": float(size)} for size in range(12)] + [{"other": 1.0}]
+
+        async def predict_all():
+            return await asyncio.gather(
+                *(batcher.predict("batched-task", row) for row in rows)
+            )
+
+        with patch.object(processor, "predict_many", wraps=processor.predict_many) as batch:
+            results = asyncio.run(predict_all())
+        assert [len(call.args[1]) for call in batch.call_args_list] == [8, 5]
+        assert results[:12] == [processor.predict("batched-task", row) for row in rows[:12]]
+        assert results[12]["success"] is False
+        assert batcher.workers == {} and batcher.queues == {}
+
+    def test_prediction_cache_hits_and_invalidation(self):
+        processor = MLProcessor()
+        df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 3.0, 10.0, 11.0, 12.0] * 10,
+                "color": ["red", "red", "blue", "green", "green", "blue"] * 10,
+                "label": ["small", "small", "small", "big", "big", "big"] * 10,
+            }
+        )
+        assert processor.train_model("cached-task", df, "label")["success"]
+
+        first = processor.predict("cached-task", {"size": 1.5, "color": "red"})
+        with patch.object(processor, "_predict_matrix") as predict_matrix:
+            again = processor.predict("cached-task", {"color": "red", "size": "1.5"})
+        predict_matrix.assert_not_called()
+        assert again["prediction"] == first["prediction"]
+        assert again["prediction_proba"] == first["prediction_proba"]
+        assert again["input_data"] == {"color": "red", "size": "1.5"}
+
+        stats = processor.prediction_cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+        assert processor.train_model("cached-task", df, "label")["success"]
+        assert processor.prediction_cache.stats()["entries"] == 0
+
+    def test_model_registry_persists_and_evicts(self, tmp_path):
+        df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 3.0, 10.0, 11.0, 12.0] * 10,
+                "label": ["small", "small", "small", "big", "big", "big"] * 10,
+            }
+        )
+        store = tmp_path / "store"
+        processor = MLProcessor(model_dir=str(store), max_resident_models=1)
+        # The directory is only created by the first save
+        assert processor.warm_up(2) == [] and not store.exists()
+        assert processor.train_model("task-a", df, "label")["success"]
+        assert processor.train_model("task-b", df, "label")["success"]
+
+        assert list(processor.models) == ["task-b"]
+        assert processor.get_model_info("task-a")["target_column"] == "label"
+        assert processor.predict("task-a", {"size": 11.0})["prediction"] == "big"
+        assert list(processor.models) == ["task-a"]
+
+        restarted = MLProcessor(model_dir=str(store), max_resident_models=1)
+        assert restarted.warm_up(2) == ["task-a"]
+        assert restarted.predict("task-b", {"size": 1.0})["prediction"] == "small"
+        assert restarted.predict("missing", {"size": 1.0})["success"] is False
+
+    def test_engine_choice_and_time_budget(self):
+        rng = np.random.default_rng(0)
+        size = rng.normal(size=20_000)
+        df = pl.DataFrame(
+            {
+                "size": size,
+                "color": rng.choice(["red", "blue", "green"], 20_000),
+                "label": np.where(size > 0, "big", "small"),
+            }
+        )
+        processor = MLProcessor()
+
+        result = processor.train_model(
+            "hgb-task", df.head(2000), "label", engine="hist_gradient_boosting"
+        )
+        assert result["success"] and result["engine"] == "hist_gradient_boosting"
+        assert result["training_samples"] == 1600
+        model = processor.models["hgb-task"]
+        assert model.max_iter == result["n_estimators"] == model.n_iter_
+        assert processor.predict("hgb-task", {"size": 2.0, "color": "teal"})["prediction"] == "big"
+
+        # Every clock reading is a second later, so each pilot fit and tree
+        # step looks like it takes 1s: the plan falls back to the pilot size
+        # and the deadline stops growth after the first step
+        clock = Mock(monotonic=Mock(side_effect=itertools.count()))
+        with patch.object(ml_pipeline, "time", clock):
+            result = processor.train_model("budget-task", df, "label", time_budget=0.5)
+        assert result["success"]
+        assert result["training_samples"] == PILOT_ROWS
+        assert result["n_estimators"] == TREES_PER_STEP
+        assert processor.models["budget-task"].n_estimators == result["n_estimators"]
+
+        with patch.object(ml_pipeline, "time", clock):
+            result = processor.train_model("boost-budget-task", df, "label", "hist_gradient_boosting", 0.5)
+        assert result["n_estimators"] == 200 // BOOSTING_STEPS
+
+        assert processor.train_model("bad-task", df, "label", engine="svm")["success"] is False
+
+    def test_unseen_category_is_routed_as_missing(self, client, model_store):
+        train_df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 10.0, 11.0] * 10,
+                "color": ["red", "blue", "green", None] * 10,
+                "label": ["small", "small", "big", "big"] * 10,
+            }
+        )
+        assert model_store.train_model("unseen-task", train_df, "label")["success"]
+
+        rows = [{"size": 10.5, "color": "purple"}, {"size": 10.5, "color": None}]
+        encoded = model_store.encode_features("unseen-task", pl.DataFrame(rows))
+        assert np.isnan(encoded[0, 1]) and np.isnan(UNSEEN_CATEGORY)
+        assert encoded[1, 1] >= 0
+        assert np.array_equal(
+            model_store.encode_row("unseen-task", rows[0]), encoded[:1], equal_nan=True
+        )
+
+        single = client.post("/predict", json={"task_id": "unseen-task", "input_data": rows[0]}).json()
+        assert single["unseen_categories"] == ["color"]
+        batch = client.post("/predict/batch", json={"task_id": "unseen-task", "rows": rows[:1]})
+        assert json.loads(batch.text)["prediction_proba"] == single["prediction_proba"]
+
+        # Only color matters; "blue" has code 0 but is the minority at every split
+        processor = MLProcessor()
+        df = pl.DataFrame(
+            {
+                "size": [1.0] * 400,
+                "color": ["blue"] * 100 + ["green", "red"] * 150,
+                "label": ["small"] * 100 + ["big"] * 300,
+            }
+        )
+        for engine in ("random_forest", "hist_gradient_boosting"):
+            assert processor.train_model("route-task", df, "label", engine)["success"]
+            predict = lambda color: processor.predict("route-task", {"size": 1.0, "color": color})
+            assert predict("blue")["prediction"] == "small", engine
+            assert predict("purple")["prediction"] == "big", engine
+
+    def test_append_updates_model_incrementally(self, client):
+        train_df = pl.DataFrame(
+            {
+                "size": [1.0, 2.0, 10.0, 11.0] * 25,
+                "color": ["red", "blue", "green", "red"] * 25,
+                "label": ["small", "small", "big", "big"] * 25,
+            }
+        )
+        processor = MLProcessor()
+        assert processor.train_model("append-task", train_df, "label")["success"]
+        csv = "size,color,label,extra\n" + "".join(
+            f"{size},purple,{label},x\n"
+            for size, label in [(1.5, "small"), (10.5, "big")] * 20
+        )
+
+        processed = ProcessingResult(
+            task_id="append-task",
+            success=True,
+            original_rows=100,
+            cleaned_rows=100,
+            columns=train_df.columns,
+            target_columns=["label"],
+            summary="Processed [100x3] > 100 rows, 3 columns",
+        )
+        with patch.object(main_module, "ml_processor", processor), patch.dict(
+            "src.api.main.csv_processor.processed_data", {"append-task": train_df}
+        ), patch.dict(
+            "src.api.main.csv_processor.processing_results", {"append-task": processed}
+        ):
+            response = client.post(
+                "/append/append-task", files={"file": ("new.csv", csv, "text/csv")}
+            )
+            assert response.status_code == 200
+            data = response.json()
+            assert data["appended_rows"] == 2 and data["total_rows"] == 102
+            result = main_module.csv_processor.processing_results["append-task"]
+            assert result.original_rows == 140 and result.cleaned_rows == 102
+
+            # Values that do not fit the column type are rejected, not imputed
+            bad = "size,color,label\nabc,red,small\n"
+            response = client.post(
+                "/append/append-task", files={"file": ("bad.csv", bad, "text/csv")}
+            )
+            assert response.status_code == 400
+            assert "size (Float64)" in response.json()["detail"]
+            assert main_module.csv_processor.processed_data["append-task"].columns == [
+                "size", "color", "label"
+            ]
+
+            # Rows already in the task's data are not appended again
+            again = client.post(
+                "/append/append-task", files={"file": ("new.csv", csv, "text/csv")}
+            ).json()
+            assert again["appended_rows"] == 0 and again["total_rows"] == 102
+
+            with patch.dict(
+                "src.api.main.training_jobs.jobs", {"busy-job": Mock(task_id="append-task")}
+            ), patch.object(
+                main_module.training_jobs, "get_requested_jobs", return_value=["busy-job"]
+            ):
+                response = client.post(
+                    "/append/append-task", files={"file": ("new.csv", csv, "text/csv")}
+                )
+                assert response.status_code == 409
+
+        # Duplicate rows are dropped, like the initial processing does
+        update = data["model_update"]
+        assert update["success"] is False and "20 new rows" in update["error"]
+
+        new_rows = pl.DataFrame(
+            {
+                "size": [1.5, 10.5] * 20,
+                "color": ["purple"] * 40,
+                "label": ["small", "big"] * 20,
+            }
+        )
+        old_trees = processor.models["append-task"].estimators_
+        result = processor.update_model("append-task", new_rows)
+        assert result["updates"] == 1 and result["n_estimators"] == 120
+        assert result["score_drift"] == result["score"] - result["pre_update_score"]
+        assert processor.models["append-task"].estimators_[:100] == old_trees
+        assert list(processor.label_encoders["append-task"]["features"]["color"].classes_) == [
+            "blue", "green", "red", "purple"
+        ]
+        prediction = processor.predict("append-task", {"size": 10.5, "color": "purple"})
+        assert prediction["prediction"] == "big" and prediction["unseen_categories"] is None
+
+        with pytest.raises(ValueError, match="full retrain"):
+            processor.update_model("append-task", new_rows.with_columns(label=pl.lit("huge")))
+
+        # Concurrent updates run one after the other, each keeping the other's trees
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(lambda _: processor.update_model("append-task", new_rows), range(2)))
+        assert processor.model_info["append-task"]["updates"] == 3
+        assert len(processor.models["append-task"].estimators_) == 160
+
+    def test_boosting_update_keeps_category_bins(self):
+        colors = ["red", "green", "blue", "black", "white"]
+        labels = {"red": "a", "green": "b", "blue": "c", "black": "a", "white": "b"}
+        rng = np.random.default_rng(0)
+        color = rng.choice(colors, 2000)
+        df = pl.DataFrame(
+            {
+                "color": color,
+                "noise": rng.normal(size=2000),
+                "label": [labels[c] for c in color],
+            }
+        )
+        processor = MLProcessor()
+        assert processor.train_model("bins-task", df, "label", "hist_gradient_boosting")["success"]
+
+        # New rows only hold two of the five colors
+        new_color = rng.choice(["green", "blue"], 200)
+        new_rows = pl.DataFrame(
+            {
+                "color": new_color,
+                "noise": rng.normal(size=200),
+                "label": [labels[c] for c in new_color],
+            }
+        )
+        result = processor.update_model("bins-task", new_rows)
+        assert result["success"] and result["score_drift"] == 0.0
+        predictions = processor.predict_frame("bins-task", df.drop("label"))["prediction"]
+        assert (predictions == df["label"]).all()
+
+    def test_prediction_cache_stats_endpoint(self, client):
+        response = client.get("/predict/cache")
+        assert response.status_code == 200
+        assert {"hits", "misses", "hit_rate", "entries"} <= set(response.json())
+
     @patch("src.api.main.ml_processor.get_model_info")
     def test_get_model_info_success(self, mock_get_info, client):
         mock_get_info.return_value = {
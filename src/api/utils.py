@@ -1,5 +1,8 @@
 import logging
+from typing import Any, Dict
+
 import colorlog
+import polars as pl
 
 
 def setup_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
@@ -34,3 +37,26 @@ def setup_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
     handler.setFormatter(formatter)
     logger.addHandler(handler)
     return logger
+
+
+def frame_memory_usage(df: pl.DataFrame) -> Dict[str, Any]:
+    """
+    Measures the in-memory size of a DataFrame from its Arrow buffers.
+
+    Args:
+        df (pl.DataFrame): Frame to measure.
+
+    Returns:
+        Dict[str, Any]: Total bytes/MB, bytes per row and bytes per column.
+    """
+    per_column = {col: int(df[col].estimated_size()) for col in df.columns}
+    total_bytes = sum(per_column.values())
+
+    return {
+        "total_bytes": total_bytes,
+        "total_mb": round(total_bytes / (1024 * 1024), 2),
+        "per_row_bytes": (
+            round(total_bytes / df.shape[0], 2) if df.shape[0] > 0 else 0
+        ),
+        "per_column": per_column,
+    }
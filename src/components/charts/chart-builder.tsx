@@ -376,7 +376,7 @@ const UniversalChart: React.FC<UniversalChartProps> = ({
                   cursor={false}
                   content={<ChartTooltipContent indicator="line" />}
                 />
-                <Bar dataKey="x" fill="var(--chart-1)" radius={[6, 6, 0, 0]} />
+                <Bar dataKey="y" fill="var(--chart-1)" radius={[6, 6, 0, 0]} />
               </BarChart>
             </ChartContainer>
           </ResponsiveContainer>